@@ -1,7 +1,13 @@
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import SystemMessage, HumanMessage, AIMessage
+import asyncio
 import os
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from conversation_memory import ConversationMemory
+from response_cache import ResponseCache, response_cache_key
 
 # 尝试导入tools，形成多层防御
 HAS_TOOLS = False
@@ -13,9 +19,84 @@ except ImportError as e:
     # 定义一个空的tools列表作为备用
     tools = []
 
+# 工具调用解析，支持<tool_call>（带下划线）和<toolcall>（没有下划线）两种格式
+TOOL_CALL_PATTERN = re.compile(r'<tool[ _]name>(.*?)</tool[ _]name>.*?<tool[ _]input>(.*?)</tool[ _]input>', re.DOTALL)
+
+# 工具超时时间（秒），图像类工具首次调用需要加载模型，给更长的时间
+DEFAULT_TOOL_TIMEOUT = 30
+TOOL_TIMEOUTS = {
+    "recognize_image": 120,
+    "annotate_papercut_multidimensionally": 180,
+}
+# 工具调用超时的标记（工具本身可能返回None）
+_TOOL_TIMED_OUT = object()
+
+DEFAULT_BASE_URL = "https://api.deepseek.com/v1"
+
+# 结果依赖图像内容或带随机性的工具，调用过这些工具的回答不写入回答缓存
+UNCACHEABLE_TOOLS = {"recognize_image", "annotate_papercut_multidimensionally", "get_random_design"}
+
+# 进程内共享的HTTP客户端：所有智能体实例复用同一个keep-alive连接池，避免每次都重新建立TLS连接
+_http_client = None
+_http_client_lock = threading.Lock()
+
+def get_shared_http_client():
+    """
+    获取共享的httpx同步客户端，httpx不可用时返回None（由ChatOpenAI自行创建）
+    """
+    global _http_client
+    if _http_client is None:
+        with _http_client_lock:
+            if _http_client is None:
+                try:
+                    import httpx
+                except ImportError:
+                    return None
+                _http_client = httpx.Client(
+                    limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=60)
+                )
+    return _http_client
+
+NO_LLM_MESSAGE = "智能体执行失败：未配置有效的DeepSeek API密钥。请在侧边栏设置有效的API密钥。"
+
+# 流式输出时需要隐藏的工具调用开始标签
+TOOL_CALL_TAGS = ("<tool_call>", "<toolcall>")
+
+def _find_tool_tag(text):
+    """
+    查找第一个工具调用开始标签的位置，没有时返回-1
+    """
+    positions = [text.find(tag) for tag in TOOL_CALL_TAGS if tag in text]
+    return min(positions) if positions else -1
+
+def _safe_prefix_length(text):
+    """
+    可以立即输出的前缀长度：末尾如果可能是工具调用标签的开头，需要等待更多内容
+    """
+    index = text.rfind("<")
+    if index >= 0 and any(tag.startswith(text[index:]) for tag in TOOL_CALL_TAGS):
+        return index
+    return len(text)
+
 class PapercutAgent:
-    def __init__(self, model_name="deepseek-chat", temperature=0.7):
-        api_key = os.environ.get("DEEPSEEK_API_KEY")
+    def __init__(self, model_name="deepseek-chat", temperature=0.7, max_tool_workers=4, tool_timeouts=None,
+                 api_key=None, base_url=DEFAULT_BASE_URL, response_cache=None, max_hung_tools=None):
+        """
+        初始化剪纸智能体
+        :param model_name: 模型名称
+        :param temperature: 采样温度
+        :param max_tool_workers: 同一轮中并发执行工具调用的线程数上限
+        :param max_hung_tools: 已超时但仍在后台运行的工具调用数上限，达到上限后新的调用直接返回超时，默认等于max_tool_workers
+        :param tool_timeouts: 按工具名覆盖默认超时时间（秒）的字典
+        :param api_key: API密钥，默认读取DEEPSEEK_API_KEY环境变量
+        :param base_url: OpenAI兼容接口地址
+        :param response_cache: 回答缓存，True使用默认的SQLite缓存，也可以传入ResponseCache实例；默认不缓存
+                               只有temperature为0或调用时指定use_cache=True才会读取缓存
+        """
+        self.model_name = model_name
+        self.temperature = temperature
+        self.response_cache = ResponseCache() if response_cache is True else (response_cache or None)
+        api_key = api_key or os.environ.get("DEEPSEEK_API_KEY")
         if not api_key:
             self.llm = None
             print("警告: 未设置DEEPSEEK_API_KEY环境变量，智能体功能将受限")
@@ -25,13 +106,22 @@ class PapercutAgent:
                     model_name=model_name,
                     temperature=temperature,
                     api_key=api_key,
-                    base_url="https://api.deepseek.com/v1"
+                    base_url=base_url,
+                    http_client=get_shared_http_client()
                 )
             except Exception as e:
                 self.llm = None
                 print(f"警告: 初始化LLM失败: {str(e)}")
         
         self.tools_dict = {tool.name: tool for tool in tools}
+        self.tool_timeouts = dict(TOOL_TIMEOUTS, **(tool_timeouts or {}))
+        # 同一轮回复中的多个工具调用互不依赖，在有界线程池中并发执行
+        self.max_tool_workers = max_tool_workers
+        self.max_hung_tools = max_tool_workers if max_hung_tools is None else max_hung_tools
+        self._tool_executor = ThreadPoolExecutor(max_workers=max_tool_workers, thread_name_prefix="papercut-tool")
+        self._tool_stats_lock = threading.Lock()
+        self._running_tools = 0
+        self._hung_tools = 0
         
         self.system_prompt = """你是一个安塞剪纸智能体，擅长剪纸图像识别、纹样知识查询和设计方案生成。
 
@@ -59,7 +149,8 @@ class PapercutAgent:
 
 如果你不确定如何回答某些问题，可以调用相关工具来获取信息。
 """
-        
+        # 工具列表在实例生命周期内不变，系统消息只构建一次
+        self._system_message = SystemMessage(content=self.system_prompt.format(tools_list=self._get_available_tools()))
 
     
     def _get_available_tools(self):
@@ -77,22 +168,227 @@ class PapercutAgent:
                 return f"工具调用失败: {str(e)}"
         return f"未知工具: {tool_name}"
     
-    def run(self, query: str, chat_history: str = "") -> str:
+    def _parse_tool_calls(self, response):
+        """
+        解析回复中的工具调用
+        :return: [(工具名称, 输入参数)] 列表，没有工具调用时为空列表
+        """
+        if not (("<tool_call>" in response and "</tool_call>" in response) or ("<toolcall>" in response and "</toolcall>" in response)):
+            return []
+        return [(tool_name.strip(), input_str.strip()) for tool_name, input_str in TOOL_CALL_PATTERN.findall(response)]
+    
+    def _call_tool_until(self, tool_name, input_str, deadline):
+        """
+        在线程池的工作线程中执行：工具本身运行在独立的守护线程里，工作线程最多等到截止时间。
+        超时后工作线程立即返回，挂起的工具在后台运行完后自行退出，不会长期占用线程池
+        :param deadline: time.monotonic() 的截止时间
+        :return: 工具结果，超时返回_TOOL_TIMED_OUT
+        """
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            # 在队列中等待时已经超时
+            return _TOOL_TIMED_OUT
+        
+        done = threading.Event()
+        state = {"result": None, "finished": False, "abandoned": False}
+        
+        def target():
+            result = self._call_tool(tool_name, input_str)
+            with self._tool_stats_lock:
+                state["result"] = result
+                state["finished"] = True
+                if state["abandoned"]:
+                    self._hung_tools -= 1
+            done.set()
+        
+        with self._tool_stats_lock:
+            if self._hung_tools >= self.max_hung_tools:
+                # 挂起的工具已达上限，不再创建新线程，总线程数始终不超过 max_tool_workers + max_hung_tools
+                hung_tools = self._hung_tools
+            else:
+                hung_tools = None
+                self._running_tools += 1
+        if hung_tools is not None:
+            print(f"警告: 已有 {hung_tools} 个超时的工具仍在后台运行，跳过工具 {tool_name}")
+            return _TOOL_TIMED_OUT
+        try:
+            threading.Thread(target=target, name=f"papercut-tool-{tool_name}", daemon=True).start()
+            done.wait(remaining)
+            with self._tool_stats_lock:
+                if state["finished"]:
+                    return state["result"]
+                state["abandoned"] = True
+                self._hung_tools += 1
+            print(f"警告: 工具 {tool_name} 超时，已在后台继续运行（当前 {self._hung_tools} 个）")
+            return _TOOL_TIMED_OUT
+        finally:
+            with self._tool_stats_lock:
+                self._running_tools -= 1
+    
+    def _call_tools(self, calls):
+        """
+        并发执行工具调用，每个工具单独计算超时，结果顺序与调用顺序一致
+        :param calls: [(工具名称, 输入参数)] 列表
+        :return: 格式化后的工具结果文本列表
+        """
+        submitted_at = time.monotonic()
+        futures = []
+        for tool_name, input_str in calls:
+            deadline = submitted_at + self.tool_timeouts.get(tool_name, DEFAULT_TOOL_TIMEOUT)
+            futures.append(self._tool_executor.submit(self._call_tool_until, tool_name, input_str, deadline))
+        
+        tool_results = []
+        for (tool_name, _), future in zip(calls, futures):
+            timeout = self.tool_timeouts.get(tool_name, DEFAULT_TOOL_TIMEOUT)
+            try:
+                result = future.result(timeout=max(0, submitted_at + timeout - time.monotonic()))
+            except FutureTimeoutError:
+                # 仍在排队的调用直接取消
+                future.cancel()
+                result = _TOOL_TIMED_OUT
+            if result is _TOOL_TIMED_OUT:
+                result = f"工具调用超时（超过{timeout}秒）"
+            tool_results.append(f"工具 [{tool_name}] 的结果：\n{result}")
+        return tool_results
+    
+    def tool_pool_stats(self):
+        """
+        工具线程池的占用情况
+        :return: 包含 max_workers、max_hung、running（占用工作线程的调用数）、hung（已超时但仍在后台运行的调用数）的字典
+        """
+        with self._tool_stats_lock:
+            return {
+                'max_workers': self.max_tool_workers,
+                'max_hung': self.max_hung_tools,
+                'running': self._running_tools,
+                'hung': self._hung_tools
+            }
+    
+    def close(self):
+        """
+        关闭工具线程池：取消排队中的工具调用，不等待正在运行的调用
+        """
+        self._tool_executor.shutdown(wait=False, cancel_futures=True)
+    
+    async def _acall_tool(self, tool_name, input_str):
+        """
+        异步执行单个工具：提供协程实现的工具直接等待，同步工具（图像识别、标注等CPU密集型）放到线程池执行
+        超时后不再等待结果，返回超时提示
+        """
+        timeout = self.tool_timeouts.get(tool_name, DEFAULT_TOOL_TIMEOUT)
+        tool = self.tools_dict.get(tool_name)
+        coroutine = getattr(tool, "coroutine", None)
+        try:
+            if coroutine is not None:
+                return await asyncio.wait_for(coroutine(input_str), timeout)
+            loop = asyncio.get_running_loop()
+            deadline = time.monotonic() + timeout
+            result = await asyncio.wait_for(
+                loop.run_in_executor(self._tool_executor, self._call_tool_until, tool_name, input_str, deadline), timeout
+            )
+            return f"工具调用超时（超过{timeout}秒）" if result is _TOOL_TIMED_OUT else result
+        except asyncio.TimeoutError:
+            return f"工具调用超时（超过{timeout}秒）"
+        except Exception as e:
+            return f"工具调用失败: {str(e)}"
+    
+    async def _acall_tools(self, calls):
+        """
+        并发执行工具调用的异步版本，结果顺序与调用顺序一致
+        :param calls: [(工具名称, 输入参数)] 列表
+        :return: 格式化后的工具结果文本列表
+        """
+        results = await asyncio.gather(*(self._acall_tool(tool_name, input_str) for tool_name, input_str in calls))
+        return [f"工具 [{tool_name}] 的结果：\n{result}" for (tool_name, _), result in zip(calls, results)]
+    
+    def _build_messages(self, query, chat_history=""):
+        """
+        构建发送给LLM的初始消息列表
+        """
+        messages = [
+            self._system_message,
+            HumanMessage(content=query)
+        ]
+        
+        # 添加历史对话：ConversationMemory 按轮次展开为问答消息，字符串整体作为一条消息
+        if isinstance(chat_history, ConversationMemory):
+            summary, turns = chat_history.context()
+            history_messages = [HumanMessage(content=f"更早的对话摘要：\n{summary}")] if summary else []
+            for user, assistant in turns:
+                history_messages.append(HumanMessage(content=user))
+                history_messages.append(AIMessage(content=assistant))
+            messages[1:1] = history_messages
+        elif chat_history:
+            messages.insert(1, HumanMessage(content=f"历史对话：{chat_history}"))
+        return messages
+    
+    def _messages_with_results(self, messages, response, tool_results):
+        """
+        构建包含工具结果的对话，让LLM生成最终回答
+        """
+        results_text = "\n\n".join(tool_results)
+        messages_with_results = messages.copy()
+        # 添加 AI 的工具调用意图
+        messages_with_results.append(AIMessage(content=response))
+        # 添加工具结果
+        messages_with_results.append(HumanMessage(content=f"以下是工具调用结果：\n{results_text}\n\n请根据工具结果，用清晰的格式回答用户的问题。"))
+        return messages_with_results
+    
+    def _format_error(self, e):
+        # 处理API密钥无效的情况
+        error_msg = str(e)
+        if "Authentication Fails" in error_msg or "Invalid API key" in error_msg or "invalid_request_error" in error_msg or "401" in error_msg:
+            return "智能体执行失败：DeepSeek API密钥无效或已过期。请在侧边栏设置有效的API密钥。"
+        return f"智能体执行失败: {error_msg}"
+    
+    def _response_cache_key(self, query, chat_history, use_cache):
+        """
+        计算回答缓存键；未启用缓存、或温度不为0且调用方没有显式允许时返回None
+        """
+        if self.response_cache is None:
+            return None
+        if not (use_cache or (use_cache is None and self.temperature == 0)):
+            return None
+        try:
+            from knowledge_store import get_knowledge_base
+            kb_version = get_knowledge_base().version
+        except Exception:
+            kb_version = None
+        return response_cache_key(query, chat_history, self.model_name, self.temperature, kb_version)
+    
+    def _store_response(self, cache_key, response, used_tools):
+        if cache_key is not None and not (used_tools & UNCACHEABLE_TOOLS):
+            self.response_cache.set(cache_key, response)
+    
+    def cache_stats(self):
+        """
+        回答缓存的命中统计，未启用缓存时返回None
+        """
+        return self.response_cache.stats() if self.response_cache is not None else None
+    
+    def run(self, query: str, chat_history="", use_cache=None) -> str:
+        """
+        运行智能体
+        :param query: 用户问题
+        :param chat_history: 历史对话（字符串或ConversationMemory）
+        :param use_cache: 是否读取回答缓存，None表示仅在temperature为0时读取
+        :return: 最终回答
+        """
         try:
             # 检查LLM是否可用
             if not self.llm:
-                return "智能体执行失败：未配置有效的DeepSeek API密钥。请在侧边栏设置有效的API密钥。"
+                return NO_LLM_MESSAGE
             
-            # 构建消息列表
-            system_message = self.system_prompt.format(tools_list=self._get_available_tools())
-            messages = [
-                SystemMessage(content=system_message),
-                HumanMessage(content=query)
-            ]
+            # 相同问题、历史、模型参数和知识库版本的回答直接从缓存返回
+            cache_key = self._response_cache_key(query, chat_history, use_cache)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            used_tools = set()
             
-            # 添加历史对话
-            if chat_history:
-                messages.insert(1, HumanMessage(content=f"历史对话：{chat_history}"))
+            # 构建消息列表
+            messages = self._build_messages(query, chat_history)
             
             # 第一轮：发送问题给 LLM
             response = self.llm.invoke(messages).content
@@ -101,45 +397,147 @@ class PapercutAgent:
             max_iterations = 3
             iteration = 0
             
-            # 支持两种格式：<tool_call>（带下划线）和<toolcall>（没有下划线）
-            while (("<tool_call>" in response and "</tool_call>" in response) or ("<toolcall>" in response and "</toolcall>" in response)) and iteration < max_iterations:
-                iteration += 1
-                
+            while iteration < max_iterations:
                 # 解析工具调用，支持两种格式
-                tool_pattern = r'<tool[ _]name>(.*?)</tool[ _]name>.*?<tool[ _]input>(.*?)</tool[ _]input>'
-                matches = re.findall(tool_pattern, response, re.DOTALL)
-                
-                if not matches:
+                calls = self._parse_tool_calls(response)
+                if not calls:
                     break
+                iteration += 1
+                used_tools.update(tool_name for tool_name, _ in calls)
                 
-                # 调用所有工具
-                tool_results = []
-                for tool_name, input_str in matches:
-                    tool_name = tool_name.strip()
-                    input_str = input_str.strip()
-                    result = self._call_tool(tool_name, input_str)
-                    tool_results.append(f"工具 [{tool_name}] 的结果：\n{result}")
-                
-                # 将工具结果返回给 LLM，让它生成最终回答
-                results_text = "\n\n".join(tool_results)
-                
-                # 构建包含工具结果的对话
-                messages_with_results = messages.copy()
-                # 添加 AI 的工具调用意图
-                messages_with_results.append(AIMessage(content=response))
-                # 添加工具结果
-                messages_with_results.append(HumanMessage(content=f"以下是工具调用结果：\n{results_text}\n\n请根据工具结果，用清晰的格式回答用户的问题。"))
+                # 并发调用所有工具
+                tool_results = self._call_tools(calls)
                 
                 # 直接调用LLM，避免使用ChatPromptTemplate
-                response = self.llm.invoke(messages_with_results).content
+                response = self.llm.invoke(self._messages_with_results(messages, response, tool_results)).content
             
+            self._store_response(cache_key, response, used_tools)
             return response
         except Exception as e:
-            # 处理API密钥无效的情况
-            error_msg = str(e)
-            if "Authentication Fails" in error_msg or "Invalid API key" in error_msg or "invalid_request_error" in error_msg or "401" in error_msg:
-                return "智能体执行失败：DeepSeek API密钥无效或已过期。请在侧边栏设置有效的API密钥。"
-            return f"智能体执行失败: {error_msg}"
+            return self._format_error(e)
+    
+    async def arun(self, query: str, chat_history="", use_cache=None) -> str:
+        """
+        run的异步版本：LLM请求走ainvoke，工具在线程池中执行，多个会话可以共享同一个事件循环
+        :param query: 用户问题
+        :param chat_history: 历史对话（字符串或ConversationMemory）
+        :param use_cache: 是否读取回答缓存，None表示仅在temperature为0时读取
+        :return: 最终回答
+        """
+        try:
+            if not self.llm:
+                return NO_LLM_MESSAGE
+            
+            cache_key = self._response_cache_key(query, chat_history, use_cache)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    return cached
+            used_tools = set()
+            
+            messages = self._build_messages(query, chat_history)
+            response = (await self.llm.ainvoke(messages)).content
+            
+            max_iterations = 3
+            iteration = 0
+            while iteration < max_iterations:
+                calls = self._parse_tool_calls(response)
+                if not calls:
+                    break
+                iteration += 1
+                used_tools.update(tool_name for tool_name, _ in calls)
+                
+                tool_results = await self._acall_tools(calls)
+                response = (await self.llm.ainvoke(self._messages_with_results(messages, response, tool_results))).content
+            
+            self._store_response(cache_key, response, used_tools)
+            return response
+        except Exception as e:
+            return self._format_error(e)
+    
+    def run_stream(self, query: str, chat_history="", use_cache=None):
+        """
+        流式版本的run：逐段产出最终回答的文本
+        工具调用块（<tool_call>...</tool_call>）不会输出，工具执行完后继续输出下一轮回答
+        :param query: 用户问题
+        :param chat_history: 历史对话（字符串或ConversationMemory）
+        :param use_cache: 是否读取回答缓存，None表示仅在temperature为0时读取
+        :return: 文本片段生成器
+        """
+        if not self.llm:
+            yield NO_LLM_MESSAGE
+            return
+        
+        try:
+            cache_key = self._response_cache_key(query, chat_history, use_cache)
+            if cache_key is not None:
+                cached = self.response_cache.get(cache_key)
+                if cached is not None:
+                    yield cached
+                    return
+        except Exception as e:
+            yield self._format_error(e)
+            return
+        
+        used_tools = set()
+        state = {"completed": False, "response": None}
+        yield from self._stream_response(query, chat_history, used_tools, state)
+        if state["completed"]:
+            # 只缓存最后一轮的回答（与run返回的内容一致），不包含工具调用前输出的文本
+            self._store_response(cache_key, state["response"], used_tools)
+    
+    def _stream_response(self, query, chat_history, used_tools, state):
+        """
+        run_stream的实现：调用过的工具名写入used_tools，
+        正常结束时将state["completed"]置为True，state["response"]为最后一轮的完整回答
+        """
+        try:
+            messages = self._build_messages(query, chat_history)
+            current_messages = messages
+            max_iterations = 3
+            iteration = 0
+            
+            while True:
+                response = ""
+                pending = ""
+                hidden = False
+                for chunk in self.llm.stream(current_messages):
+                    text = chunk.content
+                    if not text:
+                        continue
+                    response += text
+                    if hidden:
+                        continue
+                    pending += text
+                    tag_index = _find_tool_tag(pending)
+                    if tag_index >= 0:
+                        # 出现工具调用块，之后的内容先缓存，不输出
+                        hidden = True
+                        if tag_index > 0:
+                            yield pending[:tag_index]
+                        pending = pending[tag_index:]
+                        continue
+                    # 末尾可能是被拆开的标签前缀，保留到下一个片段再判断
+                    safe_length = _safe_prefix_length(pending)
+                    if safe_length:
+                        yield pending[:safe_length]
+                        pending = pending[safe_length:]
+                
+                calls = self._parse_tool_calls(response) if hidden else []
+                if not calls or iteration >= max_iterations:
+                    # 没有可执行的工具调用时与run一致，原样输出剩余内容
+                    if pending:
+                        yield pending
+                    state["response"] = response
+                    state["completed"] = True
+                    return
+                
+                iteration += 1
+                used_tools.update(tool_name for tool_name, _ in calls)
+                tool_results = self._call_tools(calls)
+                current_messages = self._messages_with_results(messages, response, tool_results)
+        except Exception as e:
+            yield self._format_error(e)
 
 if __name__ == "__main__":
     if "DEEPSEEK_API_KEY" not in os.environ:
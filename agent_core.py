@@ -14,7 +14,7 @@ from design_tool import DesignTool
 # 初始化工具
 image_tool = ImageRecognitionTool()
 knowledge_tool = KnowledgeTool()
-design_tool = DesignTool()
+design_tool = DesignTool(knowledge_tool)
 
 # 定义剪纸类别
 class_names = ['人物', '其他', '动物', '艺术剪纸', '花草']
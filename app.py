@@ -5,7 +5,10 @@ import os
 import json
 from pathlib import Path
 from agent import PapercutAgent
-from image_tool import ImageRecognitionTool
+from image_tool import ensure_image_model_loaded, get_shared_image_tool, image_tool_error, image_tool_status, prewarm_image_tool
+from knowledge_store import get_knowledge_base
+from decoded_image import DecodedImage
+from inference_scheduler import micro_batching_enabled
 
 
 
@@ -13,7 +16,10 @@ from image_tool import ImageRecognitionTool
 @st.cache_resource
 def get_image_tool():
     try:
-        return ImageRecognitionTool()
+        # 多个会话和智能体工具共享同一实例，模型在后台线程中加载，不阻塞页面渲染
+        tool = get_shared_image_tool()
+        prewarm_image_tool()
+        return tool
     except Exception as e:
         st.error(f"图像识别工具初始化失败: {str(e)}")
         return None
@@ -23,7 +29,11 @@ def get_image_tool():
 def get_annotation_tool():
     try:
         from multidimensional_annotation_tool import MultiDimensionalAnnotationTool
-        return MultiDimensionalAnnotationTool()
+        tool = MultiDimensionalAnnotationTool()
+        # 设置 PAPERCUT_MICRO_BATCHING=1 时并发的CLIP编码请求合并成批
+        if micro_batching_enabled():
+            tool.enable_batching()
+        return tool
     except ImportError as e:
         # 如果是缺少依赖（如torch），只在调试模式下显示警告
         if st.get_option('client.showErrorDetails'):
@@ -43,12 +53,11 @@ def get_design_tool():
         st.error(f"设计工具初始化失败: {str(e)}")
         return None
 
-# 创建智能体实例
-def get_agent():
-    if "DEEPSEEK_API_KEY" not in os.environ:
-        return None
+# 创建智能体实例：按API密钥和模型名称缓存，页面重新运行时复用同一个智能体和HTTP连接池
+@st.cache_resource
+def get_agent(api_key, model_name="deepseek-chat"):
     try:
-        return PapercutAgent()
+        return PapercutAgent(model_name=model_name, api_key=api_key)
     except Exception as e:
         st.error(f"智能体初始化失败: {str(e)}")
         return None
@@ -57,7 +66,7 @@ def get_agent():
 image_tool = get_image_tool()
 annotation_tool = get_annotation_tool()
 design_tool = get_design_tool()
-agent = get_agent()
+agent = get_agent(os.environ["DEEPSEEK_API_KEY"]) if "DEEPSEEK_API_KEY" in os.environ else None
 
 # 设置页面配置
 st.set_page_config(
@@ -77,13 +86,15 @@ if "api_key_set" not in st.session_state:
 st.title("✂️ 安塞剪纸智能体")
 st.write("欢迎使用安塞剪纸智能体！上传一张剪纸图像，我将为您识别其类别并提供设计建议。")
 
-# 尝试加载模型
+# 显示模型就绪状态（模型在后台加载，这里只读取状态）
 if image_tool:
-    load_success = image_tool.load_model()
-    if load_success:
+    model_status = image_tool_status()
+    if model_status == 'ready':
         st.success("✅ 所有模型已就绪，可以正常使用")
+    elif model_status == 'unavailable':
+        st.warning(f"⚠️ 模型加载失败，部分功能可能受限（图像识别功能），稍后会自动重试：{image_tool_error()}")
     else:
-        st.warning("⚠️ 模型加载失败，部分功能可能受限（图像识别功能）")
+        st.info("⏳ 图像识别模型正在后台加载，首次识别时会等待加载完成")
 else:
     st.warning("⚠️ 图像识别工具未初始化，部分功能可能受限")
 
@@ -141,19 +152,20 @@ if user_input:
         with st.chat_message("assistant"):
             message_placeholder = st.empty()
             full_response = ""
+            message_placeholder.markdown("智能体正在思考...")
             
-            with st.spinner("智能体正在思考..."):
-                try:
-                    response = agent.run(user_input)
-                    
-                    full_response = response
-                    message_placeholder.markdown(full_response)
-                    
-                    st.session_state.messages.append({"role": "assistant", "content": full_response})
-                except Exception as e:
-                    error_message = f"智能体执行失败: {str(e)}"
-                    st.error(error_message)
-                    st.session_state.messages.append({"role": "assistant", "content": error_message})
+            try:
+                # 流式显示回答，工具调用期间停留在已输出的内容上
+                for chunk in agent.run_stream(user_input):
+                    full_response += chunk
+                    message_placeholder.markdown(full_response + "▌")
+                message_placeholder.markdown(full_response)
+                
+                st.session_state.messages.append({"role": "assistant", "content": full_response})
+            except Exception as e:
+                error_message = f"智能体执行失败: {str(e)}"
+                st.error(error_message)
+                st.session_state.messages.append({"role": "assistant", "content": error_message})
 
 # 图像识别和设计方案区域
 col1, col2 = st.columns(2)
@@ -181,7 +193,8 @@ with col1:
             else:
                 with st.spinner("正在识别..."):
                     try:
-                        # 直接调用图像识别工具
+                        # 直接调用图像识别工具（模型仍在加载时等待加载完成）
+                        ensure_image_model_loaded()
                         result = image_tool.predict(temp_path)
                         
                         # 格式化结果
@@ -225,12 +238,16 @@ with col1:
             else:
                 with st.spinner("正在进行多维标注..."):
                     try:
+                        # 只解码一次，图像识别和多维标注共用
+                        decoded_image = DecodedImage(temp_path)
+                        
                         # 先进行图像识别获取类别
-                        recognition_result = image_tool.predict(temp_path)
+                        ensure_image_model_loaded()
+                        recognition_result = image_tool.predict(decoded_image)
                         class_name = recognition_result['class_name']
                         
                         # 进行多维标注
-                        annotation_result = annotation_tool.annotate(temp_path)
+                        annotation_result = annotation_tool.annotate(decoded_image)
                         
                         # 格式化结果
                         content_obj = annotation_result.get('content_object', {})
@@ -354,11 +371,15 @@ with col2:
         if st.button("标注并生成组合设计", key="annotate_design_btn"):
             with st.spinner("正在进行标注和设计生成..."):
                 try:
+                    # 只解码一次，图像识别和多维标注共用
+                    decoded_image = DecodedImage(temp_annotate_path)
+                    
                     # 先进行图像识别
-                    recognition_result = image_tool.predict(temp_annotate_path)
+                    ensure_image_model_loaded()
+                    recognition_result = image_tool.predict(decoded_image)
                     
                     # 进行多维标注
-                    annotation_result = annotation_tool.annotate(temp_annotate_path)
+                    annotation_result = annotation_tool.annotate(decoded_image)
                     
                     # 基于标注生成组合设计
                     if agent:
@@ -448,15 +469,11 @@ with col2:
 st.subheader("🔍 文字搜索剪纸图案")
 
 # 加载知识库
-# 移除@st.cache_resource装饰器，确保每次都重新加载最新的知识库数据
+# 使用进程内共享的知识库对象，与智能体工具共用同一份数据
+# 源文件修改后会在后台重建并整体替换，无需每次交互都重新解析
 def load_knowledge_base():
     """加载知识库"""
-    with open('json_database.py', 'r', encoding='utf-8') as f:
-        json_content = f.read()
-        # 提取data字典
-        json_content = json_content.split('data = ')[1]
-        knowledge_base = json.loads(json_content)
-        return knowledge_base
+    return get_knowledge_base('json_database.py').data
 
 # 加载图案数据
 knowledge_base = load_knowledge_base()
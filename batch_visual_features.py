@@ -0,0 +1,171 @@
+# 批量视觉特征引擎：多进程解码并按最长边缩小，同尺寸图像按批用NumPy计算特征，结果按路径写入列式文件
+import argparse
+import csv
+import glob
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from decoded_image import DecodedImage
+from visual_features import MAX_FEATURE_SIZE, classify_batch, extract_visual_features, feature_statistics
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+DEFAULT_CLASS_DIRS = ['人物类', '动物类', '抽象类', '花样类', '花草植物类']
+STAT_COLUMNS = ('edge_density', 'white_ratio', 'color_spread', 'texture_variance')
+LABEL_COLUMNS = ('line_style', 'cutting_technique', 'color', 'paper_texture')
+
+
+def find_images(folders):
+    """
+    收集目录下（递归）的全部图像文件
+    :param folders: 目录列表
+    :return: 排序后的文件路径列表
+    """
+    paths = []
+    for folder in folders:
+        if not os.path.isdir(folder):
+            print(f"警告：目录 '{folder}' 不存在，跳过。")
+            continue
+        for path in glob.glob(os.path.join(folder, '**', '*'), recursive=True):
+            if path.lower().endswith(IMAGE_EXTENSIONS):
+                paths.append(path)
+    return sorted(paths)
+
+
+def load_bounded(args):
+    """
+    在工作进程中解码图像并按最长边缩小（保持宽高比），与单张分析的 extract_visual_features 完全一致
+    :param args: (图像路径, 最长边上限)
+    :return: (图像路径, uint8数组或None, 错误信息或None)
+    """
+    path, max_size = args
+    try:
+        return path, np.asarray(DecodedImage(path).bounded_rgb(max_size), dtype=np.uint8), None
+    except Exception as e:
+        # 部分异常（如AssertionError）的str为空，带上异常类型便于排查
+        return path, None, f"{type(e).__name__}: {e}"
+
+
+def extract_folder_features(paths, max_size=MAX_FEATURE_SIZE, batch_size=64, max_workers=None):
+    """
+    批量计算视觉特征
+    图像按缩小后的尺寸分组，同尺寸的图像堆叠成一批计算，不拉伸、不填充，阈值与单张分析的结果一致
+    :param paths: 图像路径列表
+    :param max_size: 分析时的最长边上限，默认与单张分析相同
+    :param batch_size: 每批计算的图像数量
+    :param max_workers: 解码进程数，默认为CPU核数
+    :return: (特征列字典（按输入顺序）, 失败列表[(路径, 错误信息)])
+    """
+    rows = []
+    failures = []
+    # 尺寸 -> [(输入序号, 路径, 数组)]
+    buckets = {}
+    pending_count = 0
+
+    def flush(shape):
+        nonlocal pending_count
+        items = buckets.pop(shape)
+        pending_count -= len(items)
+        statistics = feature_statistics(np.stack([array for _, _, array in items]))
+        for row, ((index, path, _), labels) in enumerate(zip(items, classify_batch(statistics))):
+            values = {name: float(statistics[name][row]) for name in STAT_COLUMNS}
+            values.update(labels)
+            rows.append((index, path, values))
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        chunksize = max(1, min(32, len(paths) // ((max_workers or os.cpu_count() or 1) * 4)))
+        for index, (path, array, error) in enumerate(
+                executor.map(load_bounded, [(path, max_size) for path in paths], chunksize=chunksize)):
+            if array is None:
+                failures.append((path, error))
+            else:
+                bucket = buckets.setdefault(array.shape, [])
+                bucket.append((index, path, array))
+                pending_count += 1
+                if len(bucket) == batch_size:
+                    flush(array.shape)
+                elif pending_count > 4 * batch_size:
+                    # 尺寸种类很多时限制暂存的图像数量，先计算最大的一组
+                    flush(max(buckets, key=lambda shape: len(buckets[shape])))
+            if (index + 1) % 500 == 0:
+                print(f"已处理 {index + 1}/{len(paths)} 张图像")
+        for shape in list(buckets):
+            flush(shape)
+
+    rows.sort(key=lambda row: row[0])
+    columns = {'path': [path for _, path, _ in rows]}
+    for name in STAT_COLUMNS + LABEL_COLUMNS:
+        columns[name] = [values[name] for _, _, values in rows]
+    return columns, failures
+
+
+def verify_against_single(columns, sample_size=5, max_size=MAX_FEATURE_SIZE):
+    """
+    抽取若干图像，用单张分析的 extract_visual_features 重新计算，检查批量结果的标签是否一致
+    :param columns: extract_folder_features 返回的特征列
+    :param sample_size: 抽查的图像数量
+    :return: 不一致的列表[(路径, 批量结果, 单张结果)]
+    """
+    total = len(columns['path'])
+    step = max(1, total // sample_size) if sample_size else total + 1
+    mismatches = []
+    for row in range(0, total, step)[:sample_size]:
+        path = columns['path'][row]
+        batch_labels = {name: columns[name][row] for name in LABEL_COLUMNS}
+        single_labels = extract_visual_features(DecodedImage(path), max_size)
+        if batch_labels != single_labels:
+            mismatches.append((path, batch_labels, single_labels))
+    return mismatches
+
+
+def save_columns(columns, output_path):
+    """
+    保存特征：.npz 按列保存为数组，其余扩展名保存为CSV
+    """
+    if output_path.lower().endswith('.npz'):
+        arrays = {name: np.array(values) for name, values in columns.items()}
+        np.savez_compressed(output_path, **arrays)
+        return
+
+    names = list(columns)
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names)
+        writer.writerows(zip(*(columns[name] for name in names)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量计算剪纸图像的视觉特征')
+    parser.add_argument('folders', nargs='*', default=DEFAULT_CLASS_DIRS, help='图像目录，默认为五个类别目录')
+    parser.add_argument('--output', default='visual_features.csv', help='输出文件（.csv 或 .npz）')
+    parser.add_argument('--max-size', type=int, default=MAX_FEATURE_SIZE, help='分析时的最长边上限，默认与单张分析相同')
+    parser.add_argument('--batch-size', type=int, default=64, help='每批计算的图像数量')
+    parser.add_argument('--workers', type=int, default=None, help='解码进程数')
+    parser.add_argument('--verify', type=int, default=0, help='抽查的图像数量：与单张分析的结果对比')
+    args = parser.parse_args()
+
+    paths = find_images(args.folders)
+    if not paths:
+        print("错误：未找到任何图像文件！")
+        return
+    print(f"共找到 {len(paths)} 张图像")
+
+    columns, failures = extract_folder_features(
+        paths, max_size=args.max_size, batch_size=args.batch_size, max_workers=args.workers
+    )
+    save_columns(columns, args.output)
+
+    print(f"成功处理：{len(columns['path'])} 张图像，结果已保存到：{args.output}")
+    for path, error in failures:
+        print(f"处理图像 {path} 失败：{error}")
+
+    if args.verify:
+        mismatches = verify_against_single(columns, args.verify, args.max_size)
+        print(f"抽查 {min(args.verify, len(columns['path']))} 张图像，与单张分析不一致：{len(mismatches)} 张")
+        for path, batch_labels, single_labels in mismatches:
+            print(f"  {path}\n    批量：{batch_labels}\n    单张：{single_labels}")
+
+
+if __name__ == "__main__":
+    main()
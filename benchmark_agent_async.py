@@ -0,0 +1,107 @@
+import argparse
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from agent import PapercutAgent
+
+FAKE_ANSWER = "鱼纹象征年年有余、多子多福，常用于婚俗喜花和窗花。"
+
+
+class FakeChatCompletionHandler(BaseHTTPRequestHandler):
+    """
+    模拟OpenAI兼容的 /chat/completions 接口：固定延迟后返回一条回答
+    """
+    latency = 0.2
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        request = json.loads(self.rfile.read(length) or b'{}')
+        time.sleep(self.latency)
+
+        body = json.dumps({
+            'id': 'chatcmpl-fake',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': request.get('model', 'fake'),
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': FAKE_ANSWER},
+                'finish_reason': 'stop'
+            }],
+            'usage': {'prompt_tokens': 0, 'completion_tokens': 0, 'total_tokens': 0}
+        }, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_fake_server(latency):
+    """
+    在后台线程中启动模拟服务器
+    :return: (服务器, 接口地址)
+    """
+    FakeChatCompletionHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeChatCompletionHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+async def run_sessions(agent, sessions, turns):
+    """
+    并发运行多个会话，每个会话依次提问turns次
+    :return: 完成的请求数
+    """
+    async def session(index):
+        for turn in range(turns):
+            await agent.arun(f"会话{index}第{turn}轮：鱼纹有什么寓意？")
+        return turns
+
+    return sum(await asyncio.gather(*(session(index) for index in range(sessions))))
+
+
+async def benchmark(agent, session_counts, turns, sync_throughput):
+    """
+    在同一个事件循环中依次测试各并发级别（异步HTTP客户端的连接池绑定在事件循环上）
+    """
+    print(f"{'并发会话':>8}{'请求数':>8}{'耗时(s)':>10}{'吞吐量(请求/秒)':>18}{'相对同步':>10}")
+    for sessions in session_counts:
+        start = time.perf_counter()
+        completed = await run_sessions(agent, sessions, turns)
+        elapsed = time.perf_counter() - start
+        throughput = completed / elapsed
+        print(f"{sessions:>8}{completed:>8}{elapsed:>10.2f}{throughput:>18.2f}{throughput / sync_throughput:>10.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='在本地模拟LLM服务上测试异步智能体的并发吞吐量')
+    parser.add_argument('--latency', type=float, default=0.2, help='模拟服务每次请求的延迟（秒）')
+    parser.add_argument('--turns', type=int, default=3, help='每个会话的提问轮数')
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 4, 16, 64], help='并发会话数')
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(args.latency)
+    agent = PapercutAgent(api_key='fake-key', base_url=base_url)
+
+    # 同步基线：一个进程一次只能推进一个会话
+    start = time.perf_counter()
+    for turn in range(args.turns):
+        agent.run(f"同步基线第{turn}轮：鱼纹有什么寓意？")
+    sync_throughput = args.turns / (time.perf_counter() - start)
+
+    print(f"模拟延迟 {args.latency * 1000:.0f} ms，同步run吞吐量：{sync_throughput:.2f} 请求/秒\n")
+    asyncio.run(benchmark(agent, args.sessions, args.turns, sync_throughput))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+from decoded_image import DecodedImage
+from visual_features import MAX_FEATURE_SIZE, extract_visual_features
+
+# 常见的上传尺寸：从缩略图到手机原图
+DEFAULT_SIZES = [(512, 512), (1024, 768), (2048, 1536), (4000, 3000)]
+
+
+def legacy_visual_features(img_path):
+    """
+    旧版实现（全分辨率、PIL滤波、uint8差分），仅用于对比
+    """
+    img = Image.open(img_path)
+    gray_img = img.convert('L')
+    img_array = np.array(gray_img)
+    height, width = img_array.shape
+
+    # 注意：uint8相减会回绕，这是旧版的已知问题
+    horizontal_diff = np.sum(np.abs(img_array[:, 1:] - img_array[:, :-1])) / (height * (width - 1))
+    vertical_diff = np.sum(np.abs(img_array[1:, :] - img_array[:-1, :])) / ((height - 1) * width)
+    edge_density = (horizontal_diff + vertical_diff) / 2 / 255.0
+    line_style = '粗犷' if edge_density < 0.1 else '细腻'
+
+    white_pixels = np.sum(img_array > 200) / (height * width)
+    if white_pixels > 0.6:
+        cutting_technique = '阳刻'
+    elif white_pixels < 0.4:
+        cutting_technique = '阴刻'
+    else:
+        cutting_technique = '阴阳刻结合'
+
+    avg_color = np.mean(np.array(img.convert('RGB')), axis=(0, 1))
+    color = '单色' if np.std(avg_color) < 30 else '套色'
+
+    blurred = gray_img.filter(ImageFilter.GaussianBlur(radius=2))
+    texture = np.var(np.array(blurred.filter(ImageFilter.FIND_EDGES)))
+    paper_texture = '平滑' if texture < 1000 else '粗糙'
+
+    return {
+        'line_style': line_style,
+        'cutting_technique': cutting_technique,
+        'color': color,
+        'paper_texture': paper_texture
+    }
+
+
+def make_papercut_image(size, seed=0):
+    """
+    生成类似剪纸照片的测试图像：红色纸面上随机镂空的图形，加少量噪声
+    """
+    rng = np.random.default_rng(seed)
+    width, height = size
+    img = Image.new('RGB', size, (250, 248, 240))
+    draw = ImageDraw.Draw(img)
+    margin = min(width, height) // 10
+    draw.rectangle([margin, margin, width - margin, height - margin], fill=(190, 20, 30))
+    for _ in range(200):
+        x, y = rng.integers(margin, [width - margin, height - margin])
+        r = int(rng.integers(min(width, height) // 80, min(width, height) // 20))
+        draw.ellipse([x - r, y - r, x + r, y + r], fill=(250, 248, 240))
+    noise = rng.normal(0, 6, (height, width, 3))
+    array = np.clip(np.asarray(img, dtype=np.float32) + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(array)
+
+
+def time_call(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return result, float(np.median(timings))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='对比新旧视觉特征提取在不同图像尺寸下的耗时')
+    parser.add_argument('--repeat', type=int, default=3, help='每个尺寸重复次数（取中位数）')
+    parser.add_argument('--max-size', type=int, default=MAX_FEATURE_SIZE, help='新版分析的最长边上限')
+    args = parser.parse_args()
+
+    print(f"{'尺寸':<12}{'旧版(ms)':>10}{'新版(ms)':>10}{'加速比':>8}  特征是否一致")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for index, size in enumerate(DEFAULT_SIZES):
+            path = os.path.join(tmp_dir, f"papercut_{size[0]}x{size[1]}.jpg")
+            make_papercut_image(size, seed=index).save(path, quality=90)
+
+            # 两者都从文件开始计时，包含解码
+            legacy, legacy_ms = time_call(lambda: legacy_visual_features(path), args.repeat)
+            current, current_ms = time_call(
+                lambda: extract_visual_features(DecodedImage(path), args.max_size), args.repeat
+            )
+            differences = [key for key in legacy if legacy[key] != current[key]]
+            agreement = '一致' if not differences else f"不同: {', '.join(differences)}"
+            print(f"{size[0]}x{size[1]:<7}{legacy_ms:>10.1f}{current_ms:>10.1f}{legacy_ms / current_ms:>8.1f}  {agreement}")
+
+    print("\n说明：旧版差分存在uint8回绕，line_style 不一致通常来自这一修正")
+
+
+if __name__ == "__main__":
+    main()
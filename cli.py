@@ -4,7 +4,17 @@
 import os
 import argparse
 import sys
-from agent import PapercutAgent
+import json
+import time
+
+# 直接调用本地工具时使用的工具实例（按需创建）
+_local_tools = {}
+
+DESIGN_THEMES = {
+    "wedding": "婚礼",
+    "festival": "节日",
+    "random": "随机"
+}
 
 def print_banner():
     """打印欢迎横幅"""
@@ -19,36 +29,254 @@ def print_help():
     """打印帮助信息"""
     help_text = """
 可用命令：
-  recognize <image_path>   - 识别剪纸图像
-  knowledge <query>        - 查询剪纸纹样知识
+  recognize <image_path>   - 识别剪纸图像（本地模型直接识别）
+  knowledge <query>        - 查询剪纸纹样知识（本地知识库直接检索）
   design <theme>           - 生成设计方案（theme: wedding/festival/random）
   chat <message>           - 与智能体聊天
   exit/quit                - 退出程序
   help                     - 显示帮助信息
+
+在 recognize/knowledge/design 命令末尾加上 --explain，可让智能体基于本地结果进一步解读
     """
     print(help_text)
 
 def setup_environment():
     """设置环境变量"""
-    if "sk-d336ed913a0f4cd5a823aad14359fa3f" not in os.environ:
+    if "DEEPSEEK_API_KEY" not in os.environ:
         api_key = input("请输入您的DeepSeek API密钥: ")
-        os.environ["sk-d336ed913a0f4cd5a823aad14359fa3f"] = api_key
+        os.environ["DEEPSEEK_API_KEY"] = api_key
+
+def get_agent():
+    """
+    按需创建智能体实例，只有聊天或 --explain 时才需要API密钥和LLM
+    :return: PapercutAgent实例
+    """
+    if "agent" not in _local_tools:
+        setup_environment()
+        from agent import PapercutAgent
+        # 启用回答缓存：命令模板生成的解读请求会被重复提交
+        _local_tools["agent"] = PapercutAgent(response_cache=True)
+        print("智能体初始化成功！")
+    return _local_tools["agent"]
+
+def get_knowledge_tool():
+    """按需创建知识查询工具"""
+    if "knowledge" not in _local_tools:
+        from knowledge_tool import KnowledgeTool
+        _local_tools["knowledge"] = KnowledgeTool()
+    return _local_tools["knowledge"]
+
+def get_design_tool():
+    """按需创建设计工具，与知识查询工具共用同一知识库"""
+    if "design" not in _local_tools:
+        from design_tool import DesignTool
+        _local_tools["design"] = DesignTool(get_knowledge_tool())
+    return _local_tools["design"]
+
+def get_image_tool():
+    """按需获取共享的图像识别工具并加载模型"""
+    if "image" not in _local_tools:
+        from image_tool import ensure_image_model_loaded, get_shared_image_tool
+        ensure_image_model_loaded()
+        _local_tools["image"] = get_shared_image_tool()
+    return _local_tools["image"]
+
+def run_recognize(image_path):
+    """
+    直接调用图像识别工具
+    :param image_path: 图像路径
+    :return: 识别结果字典
+    """
+    return get_image_tool().predict(image_path)
+
+def run_knowledge(query, limit=5):
+    """
+    直接在本地知识库中检索纹样
+    :param query: 查询内容
+    :param limit: 返回结果数量上限
+    :return: 纹样信息列表
+    """
+    return get_knowledge_tool().search_patterns(query, limit)
+
+def run_design(theme):
+    """
+    直接调用设计工具生成方案
+    :param theme: 设计主题（wedding/festival/random）
+    :return: 设计方案字典
+    """
+    design_tool = get_design_tool()
+    if theme == "wedding":
+        return design_tool.get_wedding_combination()
+    elif theme == "festival":
+        return design_tool.get_festival_combination("春节")
+    return design_tool.get_random_combination()
+
+def format_recognition(result):
+    """格式化识别结果"""
+    lines = [f"类别: {result['class_name']}", f"置信度: {result['confidence']:.2%}", "各类别置信度:"]
+    for class_name, prob in result['all_predictions'].items():
+        lines.append(f"  - {class_name}: {prob:.2%}")
+    features = result.get('visual_features', {})
+    if features:
+        lines.append("视觉特征:")
+        lines.append(f"  - 线条风格: {features.get('line_style')}")
+        lines.append(f"  - 镂空技法: {features.get('cutting_technique')}")
+        lines.append(f"  - 色彩: {features.get('color')}")
+        lines.append(f"  - 纸张纹理: {features.get('paper_texture')}")
+    if result.get('warning'):
+        lines.append(f"提示: {result['warning']}")
+    return "\n".join(lines)
+
+def format_patterns(patterns):
+    """格式化纹样检索结果"""
+    if not patterns:
+        return "未找到相关纹样"
+    lines = []
+    for i, pattern in enumerate(patterns, 1):
+        lines.append(f"{i}. {pattern['name']} ({pattern['id']})")
+        if pattern.get('aliases'):
+            lines.append(f"   别名: {', '.join(pattern['aliases'])}")
+        if pattern.get('symbolism'):
+            lines.append(f"   象征意义: {', '.join(pattern['symbolism'])}")
+        if pattern.get('usage_scenarios'):
+            lines.append(f"   使用场景: {', '.join(pattern['usage_scenarios'])}")
+    return "\n".join(lines)
+
+def format_design(design):
+    """格式化设计方案"""
+    lines = [f"主题: {design['theme']}", f"描述: {design['description']}", "纹样组合:"]
+    for pattern in design['patterns']:
+        lines.append(f"  - {pattern['name']}: {', '.join(pattern['symbolism'])}")
+    lines.append(f"布局建议: {design['layout_suggestion']}")
+    lines.append(f"颜色建议: {design['color_suggestion']}")
+    return "\n".join(lines)
+
+def explain(query, local_result):
+    """
+    在本地结果基础上调用智能体进行解读
+    :param query: 用户原始需求
+    :param local_result: 本地工具返回的结果
+    :return: 智能体解读的文本片段生成器
+    """
+    prompt = (f"{query}\n\n以下是本地工具已经得到的结果，请直接基于该结果进行解读，无需再次调用工具：\n"
+              f"{json.dumps(local_result, ensure_ascii=False, indent=2)}")
+    # 解读请求由命令模板和本地结果拼成，内容相同时直接使用缓存的回答
+    return get_agent().run_stream(prompt, use_cache=True)
+
+def print_stream(prefix, chunks):
+    """
+    边接收边打印智能体的回答
+    :param prefix: 回答前的提示文字
+    :param chunks: 文本片段可迭代对象
+    :return: 完整回答
+    """
+    print(prefix, end="", flush=True)
+    response = ""
+    for chunk in chunks:
+        print(chunk, end="", flush=True)
+        response += chunk
+    print()
+    return response
+
+def execute_command(command, args, explain_mode=False):
+    """
+    执行单条命令
+    :param command: 命令名称
+    :param args: 命令参数
+    :param explain_mode: 是否在本地结果之后调用智能体解读
+    :return: 是否继续交互循环
+    """
+    if args.endswith("--explain"):
+        args = args[:-len("--explain")].strip()
+        explain_mode = True
+
+    if command in ["exit", "quit", "退出", "结束"]:
+        print("\n感谢使用安塞剪纸智能体，再见！")
+        return False
+
+    elif command == "help":
+        print_help()
+
+    elif command == "recognize":
+        if not args:
+            print("错误: 请指定图像路径")
+            return True
+
+        if not os.path.exists(args):
+            print(f"错误: 图像文件不存在: {args}")
+            return True
+
+        print(f"正在识别图像: {args}")
+        start = time.perf_counter()
+        result = run_recognize(args)
+        print(f"\n识别结果（本地，耗时 {(time.perf_counter() - start) * 1000:.0f} ms）:\n{format_recognition(result)}")
+        if explain_mode:
+            print_stream("\n智能体解读: ", explain(f'识别这张剪纸图像: {args}', result))
+
+    elif command == "knowledge":
+        if not args:
+            print("错误: 请输入查询内容")
+            return True
+
+        print(f"正在查询知识: {args}")
+        start = time.perf_counter()
+        patterns = run_knowledge(args)
+        print(f"\n查询结果（本地，耗时 {(time.perf_counter() - start) * 1000:.0f} ms）:\n{format_patterns(patterns)}")
+        if explain_mode:
+            print_stream("\n智能体解读: ", explain(f'查询关于{args}的剪纸纹样信息', patterns))
+
+    elif command == "design":
+        if not args:
+            print("错误: 请指定设计主题")
+            print("可用主题: wedding(婚礼), festival(节日), random(随机)")
+            return True
+
+        theme = args.lower()
+        if theme not in DESIGN_THEMES:
+            print("错误: 无效的设计主题")
+            print("可用主题: wedding(婚礼), festival(节日), random(随机)")
+            return True
+
+        print(f"正在生成{DESIGN_THEMES[theme]}主题的设计方案")
+        start = time.perf_counter()
+        design = run_design(theme)
+        print(f"\n设计方案（本地，耗时 {(time.perf_counter() - start) * 1000:.0f} ms）:\n{format_design(design)}")
+        if explain_mode:
+            print_stream("\n智能体解读: ", explain(f'请生成一个{DESIGN_THEMES[theme]}主题的剪纸设计方案', design))
+
+    elif command == "chat":
+        if not args:
+            print("错误: 请输入聊天内容")
+            return True
+
+        agent = get_agent()
+        print_stream("\n智能体回答: ", agent.run_stream(args))
+
+    else:
+        print(f"错误: 未知命令 '{command}'")
+        print("输入 'help' 查看可用命令")
+
+    return True
 
 def main():
     """主函数"""
-    print_banner()
-    
-    # 设置环境
-    setup_environment()
-    
-    # 创建智能体实例
-    try:
-        agent = PapercutAgent()
-        print("智能体初始化成功！\n")
-    except Exception as e:
-        print(f"智能体初始化失败: {str(e)}")
+    parser = argparse.ArgumentParser(description="安塞剪纸智能体命令行界面")
+    parser.add_argument("--explain", action="store_true", help="在本地工具结果之后调用智能体进行解读")
+    parser.add_argument("command", nargs=argparse.REMAINDER, help="直接执行的单条命令，例如: knowledge 鱼纹")
+    options = parser.parse_args()
+
+    # 单条命令模式：执行后直接退出
+    if options.command:
+        command = options.command[0].lower()
+        args = " ".join(options.command[1:]).strip()
+        try:
+            execute_command(command, args, options.explain)
+        except Exception as e:
+            print(f"\n发生错误: {str(e)}")
+            sys.exit(1)
         return
-    
+
+    print_banner()
     print_help()
     
     # 命令行交互循环
@@ -63,75 +291,11 @@ def main():
             # 解析命令
             parts = user_input.split(maxsplit=1)
             command = parts[0].lower()
-            args = parts[1] if len(parts) > 1 else ""
+            args = parts[1].strip() if len(parts) > 1 else ""
             
             # 处理命令
-            if command in ["exit", "quit", "退出", "结束"]:
-                print("\n感谢使用安塞剪纸智能体，再见！")
+            if not execute_command(command, args, options.explain):
                 break
-            
-            elif command == "help":
-                print_help()
-            
-            elif command == "recognize":
-                if not args:
-                    print("错误: 请指定图像路径")
-                    continue
-                
-                if not os.path.exists(args):
-                    print(f"错误: 图像文件不存在: {args}")
-                    continue
-                
-                print(f"正在识别图像: {args}")
-                query = f"识别这张剪纸图像: {args}"
-                response = agent.run(query)
-                print(f"\n识别结果: {response}")
-            
-            elif command == "knowledge":
-                if not args:
-                    print("错误: 请输入查询内容")
-                    continue
-                
-                print(f"正在查询知识: {args}")
-                query = f"查询关于{args}的剪纸纹样信息"
-                response = agent.run(query)
-                print(f"\n查询结果: {response}")
-            
-            elif command == "design":
-                if not args:
-                    print("错误: 请指定设计主题")
-                    print("可用主题: wedding(婚礼), festival(节日), random(随机)")
-                    continue
-                
-                theme = args.lower()
-                if theme not in ["wedding", "festival", "random"]:
-                    print("错误: 无效的设计主题")
-                    print("可用主题: wedding(婚礼), festival(节日), random(随机)")
-                    continue
-                
-                themes = {
-                    "wedding": "婚礼",
-                    "festival": "节日",
-                    "random": "随机"
-                }
-                
-                print(f"正在生成{themes[theme]}主题的设计方案")
-                query = f"请生成一个{themes[theme]}主题的剪纸设计方案"
-                response = agent.run(query)
-                print(f"\n设计方案: {response}")
-            
-            elif command == "chat":
-                if not args:
-                    print("错误: 请输入聊天内容")
-                    continue
-                
-                print("智能体正在思考...")
-                response = agent.run(args)
-                print(f"\n智能体回答: {response}")
-            
-            else:
-                print(f"错误: 未知命令 '{command}'")
-                print("输入 'help' 查看可用命令")
                 
         except KeyboardInterrupt:
             print("\n\n用户中断操作，程序退出。")
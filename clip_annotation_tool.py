@@ -1,62 +1,89 @@
-import torch
-import clip
 from PIL import Image
 import numpy as np
 import json
-from json_database import data
+from knowledge_store import get_knowledge_base, pattern_region_ids
+from decoded_image import DecodedImage
+from clip_text_cache import load_text_embeddings
+from clip_provider import CLIP_MODEL_NAME, get_clip_model
 
 class CLIPAnnotationTool:
     def __init__(self):
         """
         初始化CLIP多模态图像标注工具
         """
-        # 加载CLIP模型
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
+        # 获取共享的CLIP模型（与多维标注工具共用同一实例）
+        self.model, self.preprocess, self.device = get_clip_model()
         
-        # 加载知识库
-        self.knowledge_base = data["knowledge_base"]
-        self.patterns = self.knowledge_base["patterns"]
-        
-        # 生成知识库中的标签
-        self.pattern_labels = []
-        self.pattern_embeddings = []
+        # 知识库在每次使用时从共享持有者读取，热更新后重新生成纹样标签和嵌入
+        # (知识库版本, 纹样列表, 纹样标签, 文本嵌入)，整体替换保证四者属于同一版本
+        self._pattern_index = None
         
         # 预处理纹样标签
         self._preprocess_pattern_labels()
     
+    @property
+    def kb(self):
+        """当前版本的知识库（源文件修改后自动热更新）"""
+        return get_knowledge_base()
+    
+    @property
+    def knowledge_base(self):
+        return self.kb.data["knowledge_base"]
+    
+    @property
+    def patterns(self):
+        return self.knowledge_base["patterns"]
+    
+    @property
+    def pattern_labels(self):
+        return self._preprocess_pattern_labels()[1]
+    
+    @property
+    def pattern_embeddings(self):
+        return self._preprocess_pattern_labels()[2]
+    
     def _preprocess_pattern_labels(self):
         """
-        预处理知识库中的纹样标签，生成CLIP嵌入
+        预处理知识库中的纹样标签，生成CLIP嵌入；知识库版本未变化时直接复用
+        :return: (纹样列表, 纹样标签列表, 文本嵌入)，三者顺序一致
         """
-        for pattern in self.patterns:
+        kb = self.kb
+        index = self._pattern_index
+        if index is not None and index[0] == kb.version:
+            return index[1:]
+        
+        patterns = kb.data["knowledge_base"]["patterns"]
+        pattern_labels = []
+        for pattern in patterns:
             # 构建纹样的文本描述
             pattern_desc = f"{pattern['name']} 剪纸纹样，{pattern['appearance_description']}，象征{', '.join(pattern['symbolism'])}，用于{', '.join(pattern['usage_scenarios'])}场景"
-            self.pattern_labels.append(pattern_desc)
+            pattern_labels.append(pattern_desc)
         
-        # 生成CLIP文本嵌入
-        with torch.no_grad():
-            text = clip.tokenize(self.pattern_labels).to(self.device)
-            self.pattern_embeddings = self.model.encode_text(text)
-            self.pattern_embeddings /= self.pattern_embeddings.norm(dim=-1, keepdim=True)
+        # 生成CLIP文本嵌入（与多维标注工具共用磁盘缓存，标签未变化时不再编码）
+        pattern_embeddings = load_text_embeddings(self.model, pattern_labels, CLIP_MODEL_NAME, self.device)
+        self._pattern_index = (kb.version, patterns, pattern_labels, pattern_embeddings)
+        return self._pattern_index[1:]
     
     def get_multidimensional_annotation(self, image_path):
         """
         使用CLIP进行多维度图像标注
         
-        :param image_path: 图像路径
+        :param image_path: 图像路径或DecodedImage
         :return: 多维标注结果
         """
-        # 加载并预处理图像
-        image = self.preprocess(Image.open(image_path)).unsqueeze(0).to(self.device)
+        # 加载并预处理图像（只解码一次，视觉特征分析复用同一对象）
+        image_path = DecodedImage.ensure(image_path)
+        image = image_path.clip_tensor(self.preprocess).unsqueeze(0).to(self.device)
+        patterns, _, pattern_embeddings = self._preprocess_pattern_labels()
         
+        import torch
         with torch.no_grad():
             # 生成图像嵌入
             image_features = self.model.encode_image(image)
             image_features /= image_features.norm(dim=-1, keepdim=True)
             
             # 计算图像与所有纹样标签的相似度
-            similarity = (100.0 * image_features @ self.pattern_embeddings.T).softmax(dim=-1)
+            similarity = (100.0 * image_features @ pattern_embeddings.T).softmax(dim=-1)
             values, indices = similarity[0].topk(3)  # 获取前3个最相似的纹样
         
         # 解析标注结果
@@ -65,7 +92,7 @@ class CLIPAnnotationTool:
             idx = indices[i].item()
             confidence = values[i].item()
             if confidence > 0.1:  # 设置阈值
-                pattern_info = self.patterns[idx].copy()
+                pattern_info = patterns[idx].copy()
                 pattern_info['confidence'] = float(confidence)
                 top_patterns.append(pattern_info)
         
@@ -117,7 +144,6 @@ class CLIPAnnotationTool:
         形式/视觉维度标注
         """
         # 使用CLIP生成视觉特征描述
-        import cv2
         from image_tool import ImageRecognitionTool
         
         # 复用现有的视觉分析功能
@@ -146,18 +172,10 @@ class CLIPAnnotationTool:
             usage_scenarios.extend(pattern['usage_scenarios'])
             
             # 获取地域特征
-            if 'region_id' in pattern:
-                region_id = pattern['region_id']
-                for region in self.knowledge_base['regions']:
-                    if region['id'] == region_id:
-                        regional_features.append(region['name'])
-                        break
-            elif 'regions' in pattern:
-                for region_id in pattern['regions']:
-                    for region in self.knowledge_base['regions']:
-                        if region['id'] == region_id:
-                            regional_features.append(region['name'])
-                            break
+            for region_id in pattern_region_ids(pattern):
+                region = self.kb.region_by_id(region_id)
+                if region:
+                    regional_features.append(region['name'])
         
         return {
             "symbolism": list(set(symbolism)),
@@ -178,10 +196,9 @@ class CLIPAnnotationTool:
             # 获取相关纹样
             if 'related_patterns' in pattern and pattern['related_patterns']:
                 for related_id in pattern['related_patterns']:
-                    for p in self.patterns:
-                        if p['id'] == related_id:
-                            related_patterns.append(p['name'])
-                            break
+                    related_pattern = self.kb.pattern_by_id(related_id)
+                    if related_pattern:
+                        related_patterns.append(related_pattern['name'])
             
             # 添加相似纹样
             for p in self.patterns:
@@ -0,0 +1,49 @@
+# CLIP模型提供者：进程内只加载一次，首次使用时才导入torch并加载模型，所有标注工具共享同一实例
+import importlib.util
+import threading
+
+CLIP_MODEL_NAME = "ViT-B/32"
+
+# 只检查依赖是否已安装，不导入torch，纯文本会话不会因此加载torch
+HAS_CLIP = importlib.util.find_spec('torch') is not None and importlib.util.find_spec('clip') is not None
+
+_models = {}
+_lock = threading.Lock()
+
+
+def get_clip_model(model_name=CLIP_MODEL_NAME):
+    """
+    获取共享的CLIP模型，首次调用时加载
+    :param model_name: CLIP模型名称
+    :return: (模型, 预处理函数, 设备)
+    """
+    loaded = _models.get(model_name)
+    if loaded is not None:
+        return loaded
+
+    if not HAS_CLIP:
+        raise ImportError("未安装torch或clip，无法加载CLIP模型")
+
+    with _lock:
+        # 加锁后再次检查，避免多个线程重复加载
+        loaded = _models.get(model_name)
+        if loaded is None:
+            import torch
+            import clip
+
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+            model, preprocess = clip.load(model_name, device=device)
+            model.eval()
+            loaded = (model, preprocess, device)
+            _models[model_name] = loaded
+            print(f"CLIP模型已加载，使用设备: {device}")
+    return loaded
+
+
+def is_clip_loaded(model_name=CLIP_MODEL_NAME):
+    """
+    CLIP模型是否已经加载
+    :param model_name: CLIP模型名称
+    :return: 已加载返回True
+    """
+    return model_name in _models
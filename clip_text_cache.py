@@ -0,0 +1,65 @@
+# CLIP文本嵌入缓存：纹样标签只在知识库变化时重新编码，结果以.npy持久化到磁盘
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from knowledge_store import CACHE_DIR_NAME
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_DIR_NAME)
+
+
+def text_embedding_cache_path(labels, model_name, cache_dir=None):
+    """
+    根据标签内容和模型名称计算缓存文件路径
+    :param labels: 文本标签列表
+    :param model_name: CLIP模型名称，如 'ViT-B/32'
+    :param cache_dir: 缓存目录，默认为项目目录下的缓存目录
+    :return: .npy文件路径
+    """
+    digest = hashlib.sha256('\n'.join([model_name] + list(labels)).encode('utf-8')).hexdigest()
+    safe_model_name = re.sub(r'[^0-9A-Za-z]+', '-', model_name)
+    return os.path.join(cache_dir or DEFAULT_CACHE_DIR, f"clip_text_{safe_model_name}_{digest[:16]}.npy")
+
+
+def load_text_embeddings(model, labels, model_name, device, cache_dir=None):
+    """
+    获取归一化后的CLIP文本嵌入矩阵，命中磁盘缓存时不再运行文本编码器
+    :param model: clip.load返回的模型
+    :param labels: 文本标签列表
+    :param model_name: CLIP模型名称（参与缓存键计算）
+    :param device: 计算设备
+    :param cache_dir: 缓存目录
+    :return: 形状为 (标签数, 嵌入维度) 的张量，dtype与模型一致
+    """
+    import torch
+    import clip
+
+    cache_path = text_embedding_cache_path(labels, model_name, cache_dir)
+    embeddings = None
+    if os.path.exists(cache_path):
+        try:
+            embeddings = np.load(cache_path)
+            if embeddings.shape[0] != len(labels):
+                embeddings = None
+        except (OSError, ValueError) as e:
+            print(f"读取CLIP文本嵌入缓存失败，将重新计算: {str(e)}")
+            embeddings = None
+
+    if embeddings is None:
+        with torch.no_grad():
+            # 标签过长时截断到CLIP的上下文长度，避免tokenize报错
+            text_tokens = clip.tokenize(list(labels), truncate=True).to(device)
+            text_features = model.encode_text(text_tokens)
+            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
+        embeddings = text_features.float().cpu().numpy()
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp.npy"
+            np.save(tmp_path, embeddings)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print(f"写入CLIP文本嵌入缓存失败: {str(e)}")
+
+    return torch.from_numpy(embeddings).to(device=device, dtype=model.dtype)
@@ -0,0 +1,173 @@
+# 对话记忆：结构化保存对话轮次，最近若干轮原样保留，更早的轮次压缩为滚动摘要，发送给LLM的历史不超过token预算
+import hashlib
+import math
+import re
+from collections import deque
+
+_CJK = re.compile(r'[　-〿㐀-䶿一-鿿＀-￯]')
+_SENTENCE_END = re.compile(r'[。！？!?\n]')
+
+
+def estimate_tokens(text):
+    """
+    粗略估算token数：中日韩字符约每字1个token，其余字符约每4个1个token
+    :param text: 文本
+    :return: 估算的token数
+    """
+    if not text:
+        return 0
+    cjk = len(_CJK.findall(text))
+    return cjk + math.ceil((len(text) - cjk) / 4)
+
+
+def first_sentence(text, max_chars):
+    """
+    抽取第一句话，超过max_chars时截断
+    """
+    text = (text or '').strip()
+    match = _SENTENCE_END.search(text)
+    sentence = text[:match.start()] if match else text
+    sentence = sentence.strip() or text[:max_chars]
+    return sentence if len(sentence) <= max_chars else sentence[:max_chars] + '…'
+
+
+def truncate_to_tokens(text, max_tokens):
+    """
+    从开头保留文本，使估算token数不超过max_tokens
+    """
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    low, high = 0, len(text)
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens(text[:middle]) + 1 <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return text[:low] + '…'
+
+
+class ConversationTurn:
+    """
+    一轮对话（用户问题和智能体回答），token数在创建时计算一次
+    """
+    __slots__ = ('user', 'assistant', 'tokens')
+
+    def __init__(self, user, assistant):
+        self.user = user
+        self.assistant = assistant
+        self.tokens = estimate_tokens(user) + estimate_tokens(assistant)
+
+
+class ConversationMemory:
+    """
+    有界对话记忆：
+    - 最近 window_turns 轮原样保留
+    - 移出窗口的轮次抽取首句追加到滚动摘要，摘要超过 summary_tokens 时丢弃最早的摘要行
+    - 构建历史时总量不超过 max_tokens，预算不足时优先保留摘要和最新的轮次
+    每轮的开销只与窗口大小有关，与对话总轮数无关
+    """
+    def __init__(self, max_tokens=2000, window_turns=6, summary_tokens=400):
+        """
+        :param max_tokens: 发送给LLM的历史（摘要 + 最近轮次）的token上限
+        :param window_turns: 原样保留的最近轮数
+        :param summary_tokens: 滚动摘要的token上限
+        """
+        self.max_tokens = max_tokens
+        self.window_turns = window_turns
+        self.summary_tokens = summary_tokens
+        self.turns = deque()
+        self.summary_lines = deque()
+        self._summary_line_tokens = deque()
+        self._summary_total = 0
+        self.total_turns = 0
+
+    def add_turn(self, user, assistant):
+        """
+        记录一轮对话
+        :param user: 用户问题
+        :param assistant: 智能体回答
+        """
+        self.turns.append(ConversationTurn(user, assistant))
+        self.total_turns += 1
+        while len(self.turns) > self.window_turns:
+            self._summarize(self.turns.popleft())
+
+    def _summarize(self, turn):
+        line = f"用户问：{first_sentence(turn.user, 60)}；回答要点：{first_sentence(turn.assistant, 80)}"
+        tokens = estimate_tokens(line)
+        self.summary_lines.append(line)
+        self._summary_line_tokens.append(tokens)
+        self._summary_total += tokens
+        while self._summary_total > self.summary_tokens and len(self.summary_lines) > 1:
+            self.summary_lines.popleft()
+            self._summary_total -= self._summary_line_tokens.popleft()
+
+    @property
+    def summary(self):
+        """
+        较早对话的摘要文本，没有时为空字符串
+        """
+        return "\n".join(self.summary_lines)
+
+    def context(self):
+        """
+        在token预算内构建历史
+        :return: (摘要文本, [(用户问题, 智能体回答)] 按时间顺序)
+        """
+        budget = self.max_tokens
+        summary = self.summary
+        if summary:
+            summary = truncate_to_tokens(summary, min(self.summary_tokens, budget // 2))
+            budget -= estimate_tokens(summary)
+
+        selected = []
+        for turn in reversed(self.turns):
+            if turn.tokens <= budget:
+                selected.append((turn.user, turn.assistant))
+                budget -= turn.tokens
+            elif not selected and budget > 0:
+                # 最新一轮本身超出预算时截断回答，保证至少保留最近的上下文
+                user = truncate_to_tokens(turn.user, budget // 2)
+                assistant = truncate_to_tokens(turn.assistant, budget - estimate_tokens(user))
+                selected.append((user, assistant))
+                break
+            else:
+                break
+        selected.reverse()
+        return summary, selected
+
+    def render(self):
+        """
+        将历史渲染为字符串（兼容以字符串传递历史的调用方）
+        """
+        summary, turns = self.context()
+        lines = [f"更早的对话摘要：\n{summary}"] if summary else []
+        lines.extend(f"用户: {user}\n智能体: {assistant}" for user, assistant in turns)
+        return "\n".join(lines)
+
+    def digest(self):
+        """
+        当前历史内容的摘要哈希，用于缓存键
+        """
+        return hashlib.sha256(self.render().encode('utf-8')).hexdigest()
+
+    def estimated_tokens(self):
+        """
+        当前会发送给LLM的历史的估算token数
+        """
+        summary, turns = self.context()
+        return estimate_tokens(summary) + sum(estimate_tokens(user) + estimate_tokens(assistant) for user, assistant in turns)
+
+    def clear(self):
+        self.turns.clear()
+        self.summary_lines.clear()
+        self._summary_line_tokens.clear()
+        self._summary_total = 0
+        self.total_turns = 0
+
+    def __bool__(self):
+        return bool(self.turns or self.summary_lines)
+
+    def __str__(self):
+        return self.render()
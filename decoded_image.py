@@ -0,0 +1,145 @@
+# 解码后的图像对象：同一张图只解码一次，按需生成并缓存各工具所需的派生形式
+import io
+import os
+
+import numpy as np
+from PIL import Image as PILImage
+
+
+class DecodedImage:
+    """
+    一次解码、多处复用的图像：
+    - keras_tensor：分类模型输入（224×224，RGB，归一化到0-1）
+    - bounded_rgb：视觉特征分析用的有界尺寸缩略图
+    - clip_tensor：CLIP预处理后的张量
+    各派生形式在首次使用时计算并缓存
+    """
+    def __init__(self, source):
+        """
+        解码图像
+        :param source: 图像路径、图像字节、文件对象或PIL图像
+        """
+        self.path = None
+        self.data = None
+        if isinstance(source, PILImage.Image):
+            self._image = source
+        else:
+            if isinstance(source, (str, os.PathLike)):
+                self.path = os.fspath(source)
+                with open(self.path, 'rb') as f:
+                    self.data = f.read()
+            elif isinstance(source, (bytes, bytearray, memoryview)):
+                self.data = bytes(source)
+            else:
+                self.data = source.read()
+            # 只读取文件头，像素在第一次使用时才解码；只需要缩略图时可以走JPEG草稿模式
+            self._image = PILImage.open(io.BytesIO(self.data))
+        self._cache = {}
+
+    @classmethod
+    def ensure(cls, image):
+        """
+        将图像路径等输入统一转换为DecodedImage，已是DecodedImage时直接返回
+        :param image: 图像路径、字节、文件对象、PIL图像或DecodedImage
+        :return: DecodedImage实例
+        """
+        if isinstance(image, cls):
+            return image
+        return cls(image)
+
+    def _memo(self, key, factory):
+        value = self._cache.get(key)
+        if value is None:
+            value = factory()
+            self._cache[key] = value
+        return value
+
+    def cached(self, key, factory):
+        """
+        缓存由其他模块基于本图像计算的派生结果
+        :param key: 缓存键
+        :param factory: 无参函数，未命中时调用
+        """
+        return self._memo(key, factory)
+
+    @property
+    def pil(self):
+        """原始解码图像"""
+        return self._image
+
+    @property
+    def name(self):
+        """用于日志和结果展示的图像名称"""
+        return self.path or '<内存图像>'
+
+    @property
+    def rgb(self):
+        """RGB模式的图像"""
+        return self._memo('rgb', lambda: self._image if self._image.mode == 'RGB' else self._image.convert('RGB'))
+
+    def bounded_rgb(self, max_size):
+        """
+        最长边不超过max_size的RGB图像，用于不需要全分辨率的特征分析
+        JPEG总是从原始字节重新打开并使用草稿模式，解码时直接按1/2、1/4、1/8缩小，不解码全分辨率像素；
+        不依赖原图是否已解码，结果与其他派生形式的计算顺序无关
+        :param max_size: 最长边像素数
+        :return: PIL图像
+        """
+        def build():
+            img = self._image
+            if self.data is not None and img.format == 'JPEG':
+                img = PILImage.open(io.BytesIO(self.data))
+                img.draft('RGB', (max_size, max_size))
+            img = img if img.mode == 'RGB' else img.convert('RGB')
+            if max(img.size) > max_size:
+                img = img.copy() if img is self._image else img
+                img.thumbnail((max_size, max_size), PILImage.BILINEAR)
+            return img
+
+        return self._memo(('bounded_rgb', max_size), build)
+
+    def keras_tensor(self, target_size=(224, 224)):
+        """
+        分类模型输入，与keras的load_img(target_size)+img_to_array/255一致（最近邻缩放）
+        :param target_size: (高, 宽)
+        :return: float32数组，形状为 (高, 宽, 3)
+        """
+        def build():
+            height, width = target_size
+            img = self.rgb
+            if img.size != (width, height):
+                img = img.resize((width, height), PILImage.NEAREST)
+            return np.asarray(img, dtype=np.float32) / 255.0
+
+        return self._memo(('keras', tuple(target_size)), build)
+
+    def clip_tensor(self, preprocess):
+        """
+        CLIP预处理后的图像张量
+        :param preprocess: clip.load返回的预处理函数
+        :return: 形状为 (3, H, W) 的张量
+        """
+        return self._memo(('clip', id(preprocess)), lambda: preprocess(self._image))
+
+
+if __name__ == "__main__":
+    # 自检：在当前安装的Pillow上检查各派生形式，JPEG/PNG、先后顺序不同时结果一致
+    import PIL
+
+    def encode(fmt, size=(1600, 1200)):
+        buffer = io.BytesIO()
+        PILImage.new('RGB', size, (190, 20, 30)).save(buffer, format=fmt)
+        return buffer.getvalue()
+
+    for fmt in ('JPEG', 'PNG'):
+        data = encode(fmt)
+        fresh = DecodedImage(data).bounded_rgb(512)
+        decoded_first = DecodedImage(data)
+        decoded_first.keras_tensor()
+        after_decode = decoded_first.bounded_rgb(512)
+        assert max(fresh.size) <= 512, fresh.size
+        assert fresh.size == after_decode.size, (fresh.size, after_decode.size)
+        assert np.array_equal(np.asarray(fresh), np.asarray(after_decode))
+        assert DecodedImage(data).keras_tensor().shape == (224, 224, 3)
+        print(f"{fmt}: bounded_rgb {fresh.size}，keras_tensor (224, 224, 3)")
+    print(f"自检通过（Pillow {PIL.__version__}）")
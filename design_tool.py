@@ -2,11 +2,12 @@ from knowledge_tool import KnowledgeTool
 import random
 
 class DesignTool:
-    def __init__(self):
+    def __init__(self, knowledge_tool=None):
         """
         初始化设计工具
+        :param knowledge_tool: 可选的知识查询工具实例，不传时基于共享知识库新建
         """
-        self.knowledge_tool = KnowledgeTool()
+        self.knowledge_tool = knowledge_tool if knowledge_tool is not None else KnowledgeTool()
     
     def get_wedding_combination(self):
         """
@@ -139,11 +140,11 @@ class DesignTool:
         all_patterns = self.knowledge_tool.get_all_patterns()
         
         # 根据条件筛选纹样
-        filtered_patterns = all_patterns.copy()
+        filtered_patterns = list(all_patterns)
         
         # 根据区域筛选
         if region:
-            filtered_patterns = [p for p in filtered_patterns if p.get('region_id') == region]
+            filtered_patterns = self.knowledge_tool.get_patterns_by_region(region)
         
         # 根据象征意义筛选
         if symbolism:
@@ -151,7 +152,7 @@ class DesignTool:
         
         # 如果没有足够的纹样，使用随机选择
         if len(filtered_patterns) < 2:
-            filtered_patterns = all_patterns.copy()
+            filtered_patterns = list(all_patterns)
         
         # 选择2-3个纹样
         custom_patterns = random.sample(filtered_patterns, min(3, len(filtered_patterns)))
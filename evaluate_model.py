@@ -1,33 +1,26 @@
 import os
 import numpy as np
-from tensorflow.keras.models import load_model
-from tensorflow.keras.preprocessing.image import ImageDataGenerator, load_img, img_to_array
 from sklearn.model_selection import train_test_split
 import math
 import glob
+from image_tool import ImageRecognitionTool
 
 # 设置参数
 img_height, img_width = 224, 224
 batch_size = 8
 classes = ['人物类', '动物类', '抽象类', '花样类', '花草植物类']
 
-def evaluate_model():
-    # 检查模型文件是否存在
-    model_path = 'best_model.h5'
-    if not os.path.exists(model_path):
-        print(f"错误：模型文件 {model_path} 不存在！")
-        return False
-    
-    # 加载模型
-    print(f"正在加载模型：{model_path}")
-    model = load_model(model_path)
-    
-    # 收集所有图像文件路径和标签
+def collect_dataset(data_dir='.'):
+    """
+    收集各类别目录下的图像文件路径和标签
+    :param data_dir: 包含五个类别子目录的数据目录
+    :return: (文件路径列表, 标签索引列表)
+    """
     all_filepaths = []
     all_labels = []
     
     for label_idx, class_name in enumerate(classes):
-        class_dir = os.path.join('.', class_name)
+        class_dir = os.path.join(data_dir, class_name)
         if not os.path.exists(class_dir):
             print(f"警告：类别目录 '{class_dir}' 不存在，跳过。")
             continue
@@ -38,6 +31,49 @@ def evaluate_model():
             all_filepaths.extend(files)
             all_labels.extend([label_idx] * len(files))
     
+    return all_filepaths, all_labels
+
+def split_dataset(all_filepaths, all_labels):
+    """
+    与训练时相同的方式分割数据集（80%训练，20%验证）
+    :return: (训练文件, 验证文件, 训练标签, 验证标签)
+    """
+    return train_test_split(
+        all_filepaths, all_labels,
+        test_size=0.2,
+        stratify=all_labels,
+        random_state=42
+    )
+
+def categorical_crossentropy(probabilities, labels, epsilon=1e-7):
+    """
+    与keras的categorical_crossentropy（from_logits=False）一致的平均损失
+    :param probabilities: 各类别概率，形状为 (N, 类别数)
+    :param labels: 真实标签索引，形状为 (N,)
+    :return: 平均损失
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float32)
+    probabilities = probabilities / np.maximum(probabilities.sum(axis=-1, keepdims=True), epsilon)
+    probabilities = np.clip(probabilities, epsilon, 1 - epsilon)
+    true_probabilities = probabilities[np.arange(len(labels)), np.asarray(labels)]
+    return float(-np.mean(np.log(true_probabilities)))
+
+def evaluate_model():
+    # 检查模型文件是否存在
+    model_path = 'best_model.h5'
+    if not os.path.exists(model_path):
+        print(f"错误：模型文件 {model_path} 不存在！")
+        return False
+    
+    # 加载模型
+    print(f"正在加载模型：{model_path}")
+    tool = ImageRecognitionTool(model_path)
+    if not tool.load_model():
+        return False
+    
+    # 收集所有图像文件路径和标签
+    all_filepaths, all_labels = collect_dataset()
+    
     if len(all_filepaths) == 0:
         print("错误：未找到任何图像文件！")
         return False
@@ -45,29 +81,20 @@ def evaluate_model():
     print(f"共找到 {len(all_filepaths)} 个样本")
     
     # 分割数据集（80%训练，20%验证）
-    _, val_files, _, val_labels = train_test_split(
-        all_filepaths, all_labels,
-        test_size=0.2,
-        stratify=all_labels,
-        random_state=42
-    )
+    _, val_files, _, val_labels = split_dataset(all_filepaths, all_labels)
     
     print(f"验证集样本数: {len(val_files)}")
     
-    # 预处理验证数据
-    def preprocess_image(filepath):
-        img = load_img(filepath, target_size=(img_height, img_width))
-        img_array = img_to_array(img)
-        img_array = img_array / 255.0
-        return img_array
-    
-    val_images = np.array([preprocess_image(file) for file in val_files])
-    val_labels_categorical = tf.keras.utils.to_categorical(val_labels, num_classes=len(classes))
-    
-    # 评估模型
+    # 评估模型：并行解码验证图像，按批执行前向计算
     print("正在评估模型...")
-    val_loss, val_accuracy = model.evaluate(val_images, val_labels_categorical, batch_size=batch_size, verbose=1)
+    results = tool.predict_batch(val_files, batch_size=batch_size, with_visual_features=False)
+    predicted_labels = np.array([result['class_index'] for result in results])
+    val_accuracy = float(np.mean(predicted_labels == np.array(val_labels)))
+    # 由批量预测的概率计算损失，等价于原先model.evaluate返回的val_loss
+    probabilities = [[result['all_predictions'][name] for name in tool.class_names] for result in results]
+    val_loss = categorical_crossentropy(probabilities, val_labels)
     
+    print(f"验证集损失：{val_loss:.4f}")
     print(f"模型准确率：{val_accuracy * 100:.2f}%")
     
     # 检查是否达到50%的准确率要求
@@ -79,5 +106,4 @@ def evaluate_model():
         return False
 
 if __name__ == "__main__":
-    import tensorflow as tf
     evaluate_model()
@@ -0,0 +1,139 @@
+import argparse
+import os
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from decoded_image import DecodedImage
+from evaluate_model import classes, collect_dataset, img_height, img_width, split_dataset
+from image_tool import MODEL_CANDIDATES, TFLiteModel, tflite_model_path
+
+QUANTIZATIONS = ('dynamic', 'int8')
+
+
+def load_array(img_path):
+    """
+    按推理时相同的方式预处理图像（224×224，归一化到0-1）
+    """
+    return DecodedImage(img_path).keras_tensor((img_height, img_width))
+
+
+def representative_dataset(files, num_samples=100):
+    """
+    全int8量化的校准数据：从训练集中均匀抽取样本
+    :param files: 训练集图像路径列表
+    :param num_samples: 校准样本数量
+    """
+    step = max(1, len(files) // num_samples)
+    samples = files[::step][:num_samples]
+
+    def generator():
+        for img_path in samples:
+            try:
+                yield [np.expand_dims(load_array(img_path), axis=0)]
+            except Exception as e:
+                print(f"跳过无法读取的校准图像 {img_path}: {str(e)}")
+
+    return generator
+
+
+def export_tflite(model, output_path, quantization, calibration_files=None, num_samples=100):
+    """
+    将keras模型转换为TFLite
+    :param model: 已加载的keras模型
+    :param output_path: 输出的.tflite文件路径
+    :param quantization: 'dynamic'（动态范围量化，权重int8）或 'int8'（全整型量化，输入输出也为int8）
+    :param calibration_files: 全int8量化使用的校准图像路径
+    :param num_samples: 校准样本数量
+    :return: 输出文件大小（字节）
+    """
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == 'int8':
+        if not calibration_files:
+            raise ValueError("全int8量化需要校准数据")
+        converter.representative_dataset = representative_dataset(calibration_files, num_samples)
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        converter.inference_input_type = tf.int8
+        converter.inference_output_type = tf.int8
+    elif quantization != 'dynamic':
+        raise ValueError(f"不支持的量化方式: {quantization}")
+
+    tflite_model = converter.convert()
+    with open(output_path, 'wb') as f:
+        f.write(tflite_model)
+    return len(tflite_model)
+
+
+def measure(model, arrays, labels):
+    """
+    逐张推理验证集，统计准确率和单张延迟
+    :return: (准确率, 平均延迟毫秒, P95延迟毫秒)
+    """
+    latencies = []
+    predicted = []
+    for array in arrays:
+        start = time.perf_counter()
+        output = model.predict_on_batch(np.expand_dims(array, axis=0))
+        latencies.append((time.perf_counter() - start) * 1000)
+        predicted.append(int(np.argmax(np.asarray(output)[0])))
+    accuracy = float(np.mean(np.array(predicted) == np.array(labels)))
+    return accuracy, float(np.mean(latencies)), float(np.percentile(latencies, 95))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='将剪纸分类模型导出为TFLite并对比量化前后的延迟和准确率')
+    parser.add_argument('--model', help='h5模型路径，默认按图像识别工具的候选路径查找')
+    parser.add_argument('--quantization', choices=QUANTIZATIONS + ('all',), default='all', help='量化方式')
+    parser.add_argument('--samples', type=int, default=100, help='全int8量化的校准样本数')
+    parser.add_argument('--threads', type=int, default=None, help='TFLite解释器线程数')
+    parser.add_argument('--skip-eval', action='store_true', help='只导出，不在验证集上对比')
+    args = parser.parse_args()
+
+    model_path = args.model or next((c for c in MODEL_CANDIDATES if os.path.exists(c)), None)
+    if not model_path or not os.path.exists(model_path):
+        print(f"错误：模型文件 {model_path or 'best_model.h5'} 不存在！")
+        return False
+
+    print(f"正在加载模型：{model_path}")
+    model = tf.keras.models.load_model(model_path)
+
+    all_filepaths, all_labels = collect_dataset()
+    if not all_filepaths:
+        print("错误：未找到任何图像文件！")
+        return False
+    train_files, val_files, _, val_labels = split_dataset(all_filepaths, all_labels)
+
+    quantizations = QUANTIZATIONS if args.quantization == 'all' else (args.quantization,)
+    exported = {}
+    for quantization in quantizations:
+        output_path = tflite_model_path(model_path, quantization)
+        print(f"正在导出 {quantization} 量化模型...")
+        size = export_tflite(model, output_path, quantization, train_files, args.samples)
+        exported[quantization] = output_path
+        print(f"已保存：{output_path}（{size / 1024 / 1024:.1f} MB）")
+
+    if args.skip_eval:
+        return True
+
+    print(f"\n在验证集上对比（{len(val_files)} 张，类别：{', '.join(classes)}）...")
+    val_arrays = [load_array(img_path) for img_path in val_files]
+
+    base_accuracy, base_mean, base_p95 = measure(model, val_arrays, val_labels)
+    base_size = os.path.getsize(model_path)
+    print(f"\n{'模型':<12}{'大小(MB)':>10}{'准确率':>10}{'准确率差':>10}{'平均延迟(ms)':>14}{'P95(ms)':>10}{'加速比':>8}")
+    print(f"{'h5':<12}{base_size / 1024 / 1024:>10.1f}{base_accuracy * 100:>9.2f}%{'-':>10}{base_mean:>14.2f}{base_p95:>10.2f}{1.0:>8.2f}")
+
+    for quantization, output_path in exported.items():
+        tflite_model = TFLiteModel(output_path, num_threads=args.threads)
+        accuracy, mean, p95 = measure(tflite_model, val_arrays, val_labels)
+        size = os.path.getsize(output_path)
+        delta = (accuracy - base_accuracy) * 100
+        print(f"{quantization:<12}{size / 1024 / 1024:>10.1f}{accuracy * 100:>9.2f}%{delta:>+9.2f}%"
+              f"{mean:>14.2f}{p95:>10.2f}{base_mean / mean:>8.2f}")
+    return True
+
+
+if __name__ == "__main__":
+    main()
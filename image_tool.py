@@ -1,18 +1,151 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing import image
 import numpy as np
 import os
-from PIL import Image as PILImage, ImageOps
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decoded_image import DecodedImage
+from result_cache import file_version, get_result_cache, result_cache_key
+from inference_scheduler import MicroBatchScheduler, micro_batching_enabled
+from visual_features import FEATURES_VERSION, extract_visual_features
+
+# 默认模型文件候选路径
+MODEL_CANDIDATES = [
+    'papercut_model_final.h5',
+    './papercut_model_final.h5',
+    '../papercut_model_final.h5',
+    'best_model.h5',
+    './best_model.h5',
+    '../best_model.h5'
+]
+
+# 分类模型的输入形状（不含批次维度）
+INPUT_SHAPE = (224, 224, 3)
+
+def configure_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    设置TensorFlow的算子内/算子间线程数
+    必须在TensorFlow运行时初始化（第一次执行计算）之前调用，否则设置不会生效
+    :param intra_op_threads: 单个算子内部的并行线程数
+    :param inter_op_threads: 独立算子之间的并行线程数
+    :return: 是否设置成功
+    """
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        return True
+    except RuntimeError as e:
+        print(f"TensorFlow运行时已初始化，线程数设置未生效: {str(e)}")
+        return False
+
+def tflite_model_path(model_path, quantization):
+    """
+    h5模型对应的TFLite文件路径，如 best_model.h5 -> best_model_int8.tflite
+    :param model_path: h5模型路径
+    :param quantization: 量化方式，'dynamic' 或 'int8'
+    """
+    return f"{os.path.splitext(model_path)[0]}_{quantization}.tflite"
+
+def resolve_tflite_model(model_path):
+    """
+    TFLite后端使用的模型文件：.tflite 文件原样返回，h5模型解析为导出的TFLite文件（优先全int8）
+    :param model_path: 模型路径
+    :return: .tflite文件路径
+    :raise FileNotFoundError: h5模型没有对应的TFLite导出文件
+    """
+    if model_path.lower().endswith('.tflite'):
+        return model_path
+    expected = [tflite_model_path(model_path, quantization) for quantization in ('int8', 'dynamic')]
+    for candidate in expected:
+        if os.path.exists(candidate):
+            return candidate
+    raise FileNotFoundError(
+        f"未找到 {model_path} 导出的TFLite模型，期望路径: {' 或 '.join(expected)}（可先运行 export_tflite.py 导出）"
+    )
+
+class TFLiteModel:
+    """
+    TFLite解释器的封装，提供与keras模型一致的predict/predict_on_batch接口
+    全int8模型的输入量化和输出反量化在这里完成，调用方仍然传入0-1的float32数组
+    """
+    def __init__(self, model_path, num_threads=None):
+        """
+        :param model_path: .tflite文件路径
+        :param num_threads: 解释器线程数
+        """
+        self.model_path = model_path
+        self.interpreter = tf.lite.Interpreter(model_path=model_path, num_threads=num_threads)
+        self.interpreter.allocate_tensors()
+        self.input_detail = self.interpreter.get_input_details()[0]
+        self.output_detail = self.interpreter.get_output_details()[0]
+        self._batch_size = int(self.input_detail['shape'][0])
+        # 解释器不是线程安全的
+        self._lock = threading.Lock()
+    
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            shape = list(self.input_detail['shape'])
+            shape[0] = batch_size
+            self.interpreter.resize_tensor_input(self.input_detail['index'], shape)
+            self.interpreter.allocate_tensors()
+            self.input_detail = self.interpreter.get_input_details()[0]
+            self.output_detail = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+    
+    def predict_on_batch(self, batch):
+        """
+        :param batch: float32数组，形状为 (N, 高, 宽, 3)
+        :return: 各类别概率，形状为 (N, 类别数)
+        """
+        batch = np.asarray(batch, dtype=np.float32)
+        input_dtype = self.input_detail['dtype']
+        if input_dtype != np.float32:
+            scale, zero_point = self.input_detail['quantization']
+            info = np.iinfo(input_dtype)
+            batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(input_dtype)
+        
+        with self._lock:
+            self._resize(len(batch))
+            self.interpreter.set_tensor(self.input_detail['index'], batch)
+            self.interpreter.invoke()
+            output = self.interpreter.get_tensor(self.output_detail['index']).copy()
+        
+        if output.dtype != np.float32:
+            scale, zero_point = self.output_detail['quantization']
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+    
+    def predict(self, batch, verbose=0):
+        return self.predict_on_batch(batch)
 
 class ImageRecognitionTool:
-    def __init__(self, model_path=None):
+    def __init__(self, model_path=None, result_cache=None, backend='keras', num_threads=None,
+                 intra_op_threads=None, inter_op_threads=None):
         """
         初始化图像识别工具
         :param model_path: 模型文件路径
+        :param result_cache: 结果缓存（ResultCache），None使用共享的默认缓存，False表示不缓存
+        :param backend: 推理后端，'keras' 使用h5模型，'tflite' 使用量化后的TFLite模型（传入h5路径时使用其导出的TFLite文件）
+        :param num_threads: TFLite解释器线程数
+        :param intra_op_threads: TensorFlow算子内线程数（需在首次加载模型前设置）
+        :param inter_op_threads: TensorFlow算子间线程数（需在首次加载模型前设置）
         """
+        if backend not in ('keras', 'tflite'):
+            raise ValueError(f"不支持的推理后端: {backend}")
+        if backend == 'tflite' and model_path:
+            model_path = resolve_tflite_model(model_path)
+        self.backend = backend
+        self.num_threads = num_threads
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
         self.model_path = model_path
         self.model = None
+        self._infer = None
         self.class_names = ['人物类', '动物类', '抽象类', '花样类', '花草植物类']
+        self.result_cache = get_result_cache() if result_cache is None else result_cache
+        self.scheduler = None
         # 不立即加载模型，而是在需要时调用load_model方法
         # self._load_model()
     
@@ -23,17 +156,16 @@ class ImageRecognitionTool:
         :return: 是否加载成功
         """
         if model_path:
-            self.model_path = model_path
+            self.model_path = resolve_tflite_model(model_path) if self.backend == 'tflite' else model_path
         
-        # 模型文件候选路径列表
-        model_candidates = [
-            'papercut_model_final.h5',
-            './papercut_model_final.h5',
-            '../papercut_model_final.h5',
-            'best_model.h5',
-            './best_model.h5',
-            '../best_model.h5'
-        ]
+        # 模型文件候选路径列表，TFLite后端优先使用全int8模型
+        if self.backend == 'tflite':
+            model_candidates = [
+                tflite_model_path(candidate, quantization)
+                for candidate in MODEL_CANDIDATES for quantization in ('int8', 'dynamic')
+            ]
+        else:
+            model_candidates = list(MODEL_CANDIDATES)
         
         # 如果提供了model_path，添加到候选列表首位
         if self.model_path:
@@ -57,7 +189,14 @@ class ImageRecognitionTool:
         """
         try:
             if self.model_path and os.path.exists(self.model_path):
-                self.model = tf.keras.models.load_model(self.model_path)
+                if self.intra_op_threads or self.inter_op_threads:
+                    configure_threads(self.intra_op_threads, self.inter_op_threads)
+                if self.backend == 'tflite':
+                    self.model = TFLiteModel(self.model_path, num_threads=self.num_threads)
+                    self._infer = None
+                else:
+                    self.model = tf.keras.models.load_model(self.model_path)
+                    self._infer = self._compile_inference(self.model)
                 print(f"成功加载模型: {self.model_path}")
                 return True
             else:
@@ -65,152 +204,337 @@ class ImageRecognitionTool:
                 print("模型未加载，图像识别功能将不可用")
                 # 不抛出异常，而是设置模型为None，让应用能够继续运行
                 self.model = None
+                self._infer = None
                 return False
         except Exception as e:
             print(f"加载模型失败: {str(e)}")
             print("模型未加载，图像识别功能将不可用")
             # 不抛出异常，而是设置模型为None，让应用能够继续运行
             self.model = None
+            self._infer = None
             return False
     
+    def _compile_inference(self, model):
+        """
+        将keras模型包装为固定输入签名的tf.function并预热
+        批次维度为None，任意批大小都复用同一个计算图，不会重新trace；
+        单张推理不再经过model.predict的数据适配器和回调，只剩前向计算
+        :param model: keras模型
+        :return: 推理函数
+        """
+        @tf.function(input_signature=[tf.TensorSpec(shape=(None,) + INPUT_SHAPE, dtype=tf.float32)])
+        def infer(images):
+            return model(images, training=False)
+        
+        # 预热：触发trace和图优化，首个真实请求不再承担这部分开销
+        infer(tf.zeros((1,) + INPUT_SHAPE, dtype=tf.float32))
+        return infer
+    
+    def _forward(self, batch):
+        """
+        执行一次前向计算
+        :param batch: float32数组，形状为 (N, 224, 224, 3)
+        :return: 各类别概率数组，形状为 (N, 类别数)
+        """
+        if self._infer is not None:
+            return self._infer(tf.convert_to_tensor(batch, dtype=tf.float32)).numpy()
+        return np.asarray(self.model.predict_on_batch(batch))
+    
+    def enable_batching(self, max_batch_size=16, max_wait_ms=10):
+        """
+        启用动态微批：并发的predict请求在时间窗口内合并为一次前向计算
+        :param max_batch_size: 每批最多合并的图像数
+        :param max_wait_ms: 收集请求的时间窗口（毫秒）
+        :return: 调度器，可通过其metrics()查看队列深度和批大小
+        """
+        if self.scheduler is None:
+            self.scheduler = MicroBatchScheduler(
+                self._forward_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name='image-recognition'
+            )
+        return self.scheduler
+    
+    def _forward_batch(self, img_arrays):
+        """
+        调度器的批量推理函数
+        :param img_arrays: 预处理后的单张图像数组列表，每个形状为 (高, 宽, 3)
+        :return: 各图像的类别概率数组列表
+        """
+        outputs = self._forward(np.stack(img_arrays))
+        return list(outputs)
+    
     def preprocess_image(self, img_path, target_size=(224, 224)):
         """
         预处理图像
-        :param img_path: 图像路径
+        :param img_path: 图像路径或DecodedImage
         :param target_size: 目标尺寸
         :return: 预处理后的图像
         """
-        img = image.load_img(img_path, target_size=target_size)
-        img_array = image.img_to_array(img)
-        img_array = np.expand_dims(img_array, axis=0)
-        img_array /= 255.0  # 归一化
-        return img_array
+        # 归一化后的数组由DecodedImage缓存，同一图像不会重复解码和缩放
+        img_array = DecodedImage.ensure(img_path).keras_tensor(target_size)
+        return np.expand_dims(img_array, axis=0)
     
     def analyze_visual_features(self, img_path):
         """
         分析图像的视觉特征（不使用cv2）
-        :param img_path: 图像路径
+        在最长边不超过MAX_FEATURE_SIZE的缩略图上一次性计算，同一图像的结果会被缓存
+        :param img_path: 图像路径或DecodedImage
         :return: 视觉特征字典
         """
-        # 使用Pillow读取图像
-        img = PILImage.open(img_path)
-        
-        # 转换为灰度图
-        gray_img = ImageOps.grayscale(img)
-        
-        # 分析线条特征
-        # 简单的边缘检测：计算像素变化率
-        img_array = np.array(gray_img)
-        height, width = img_array.shape
-        
-        # 计算水平和垂直方向的像素差异
-        horizontal_diff = np.sum(np.abs(img_array[:, 1:] - img_array[:, :-1])) / (height * (width - 1))
-        vertical_diff = np.sum(np.abs(img_array[1:, :] - img_array[:-1, :])) / ((height - 1) * width)
-        
-        edge_density = (horizontal_diff + vertical_diff) / 2 / 255.0  # 归一化到0-1范围
-        
-        # 判断线条风格
-        if edge_density < 0.1:
-            line_style = '粗犷'
-        else:
-            line_style = '细腻'
-        
-        # 分析镂空技法
-        # 简单判断：白色区域比例
-        white_pixels = np.sum(img_array > 200) / (height * width)
-        if white_pixels > 0.6:
-            cutting_technique = '阳刻'  # 保留主体，镂空背景
-        elif white_pixels < 0.4:
-            cutting_technique = '阴刻'  # 镂空主体，保留背景
-        else:
-            cutting_technique = '阴阳刻结合'
-        
-        # 分析色彩
-        img_rgb = img.convert('RGB')
-        rgb_array = np.array(img_rgb)
-        avg_color = np.mean(rgb_array, axis=(0, 1))
-        
-        # 判断是否为单色
-        # 计算颜色通道的标准差，如果很小则认为是单色
-        if np.std(avg_color) < 30:
-            color = '单色'
-        else:
-            color = '套色'
-        
-        # 分析纸张纹理
-        # 使用PIL的Laplacian滤波器实现
-        from PIL import ImageFilter
-        
-        # 应用模糊和边缘检测
-        blurred = gray_img.filter(ImageFilter.GaussianBlur(radius=2))
-        edge_img = blurred.filter(ImageFilter.FIND_EDGES)
-        
-        # 计算纹理值
-        edge_array = np.array(edge_img)
-        texture = np.var(edge_array)
-        
-        if texture < 1000:
-            paper_texture = '平滑'
-        else:
-            paper_texture = '粗糙'
-        
+        return extract_visual_features(DecodedImage.ensure(img_path))
+    
+    def _fallback_visual_features(self, img_path):
+        """
+        降级路径中的视觉特征分析：分析本身失败时返回空字典，保证降级结果总能返回给调用方
+        """
+        try:
+            return self.analyze_visual_features(img_path)
+        except Exception as e:
+            print(f"视觉特征分析失败: {str(e)}")
+            return {}
+    
+    def _fallback_result(self, visual_features, warning):
+        """
+        构建无法分类时的结果字典（只包含视觉特征）
+        """
+        return {
+            'class_name': '未知',
+            'class_index': -1,
+            'confidence': 0.0,
+            'all_predictions': {cls: 0.0 for cls in self.class_names},
+            'visual_features': visual_features,
+            'warning': warning
+        }
+    
+    def _build_result(self, prediction, visual_features):
+        """
+        根据单张图像的预测概率构建结果字典
+        :param prediction: 各类别概率数组
+        :param visual_features: 视觉特征字典
+        """
+        predicted_class = np.argmax(prediction)
+        confidence = prediction[predicted_class]
         return {
-            'line_style': line_style,
-            'cutting_technique': cutting_technique,
-            'color': color,
-            'paper_texture': paper_texture
+            'class_name': self.class_names[predicted_class],
+            'class_index': int(predicted_class),
+            'confidence': float(confidence),
+            'all_predictions': {self.class_names[i]: float(prediction[i]) for i in range(len(self.class_names))},
+            'visual_features': visual_features
         }
     
+    def _result_cache_key(self, decoded):
+        """
+        计算预测结果的缓存键，模型未加载或没有原始字节时返回None（不缓存）
+        """
+        if not self.result_cache or self.model is None or decoded.data is None:
+            return None
+        model_version = file_version(self.model_path)
+        if model_version is None:
+            return None
+        return result_cache_key('predict', decoded.data, model_version, features_version=FEATURES_VERSION)
+    
     def predict(self, img_path):
         """
         预测图像类别并分析特征
-        :param img_path: 图像路径
+        :param img_path: 图像路径或DecodedImage
         :return: 预测结果和特征分析字典
         """
+        # 只解码一次，分类和视觉特征分析共用
+        img_path = DecodedImage.ensure(img_path)
+        
+        # 相同图像字节和模型版本的结果直接从缓存返回
+        cache_key = self._result_cache_key(img_path)
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
         if self.model is None:
             # 模型未加载时，只返回视觉特征分析结果
             print("模型未加载，只返回视觉特征分析结果")
-            visual_features = self.analyze_visual_features(img_path)
-            return {
-                'class_name': '未知',
-                'class_index': -1,
-                'confidence': 0.0,
-                'all_predictions': {cls: 0.0 for cls in self.class_names},
-                'visual_features': visual_features,
-                'warning': '模型未加载，无法进行图像分类'
-            }
+            visual_features = self._fallback_visual_features(img_path)
+            return self._fallback_result(visual_features, '模型未加载，无法进行图像分类')
         
         try:
             # 预处理图像
             img_array = self.preprocess_image(img_path)
             
-            # 预测
-            predictions = self.model.predict(img_array)
-            predicted_class = np.argmax(predictions[0])
-            confidence = predictions[0][predicted_class]
+            # 预测（启用微批时与其他并发请求合并执行）
+            if self.scheduler is not None:
+                prediction = self.scheduler.submit(img_array[0]).result()
+            else:
+                prediction = self._forward(img_array)[0]
             
             # 分析视觉特征
             visual_features = self.analyze_visual_features(img_path)
             
-            return {
-                'class_name': self.class_names[predicted_class],
-                'class_index': int(predicted_class),
-                'confidence': float(confidence),
-                'all_predictions': {self.class_names[i]: float(predictions[0][i]) for i in range(len(self.class_names))},
-                'visual_features': visual_features
-            }
+            result = self._build_result(prediction, visual_features)
+            if cache_key is not None:
+                self.result_cache.set(cache_key, result)
+            return result
         except Exception as e:
             print(f"预测失败: {str(e)}")
-            # 预测失败时，只返回视觉特征分析结果
-            visual_features = self.analyze_visual_features(img_path)
-            return {
-                'class_name': '未知',
-                'class_index': -1,
-                'confidence': 0.0,
-                'all_predictions': {cls: 0.0 for cls in self.class_names},
-                'visual_features': visual_features,
-                'warning': f'预测失败: {str(e)}'
-            }
+            # 预测失败时，只返回视觉特征分析结果（失败可能来自特征分析本身，这里不再抛出）
+            visual_features = self._fallback_visual_features(img_path)
+            return self._fallback_result(visual_features, f'预测失败: {str(e)}')
+    
+    def _prepare_batch_item(self, img_path, with_visual_features):
+        """
+        批量预测时在工作线程中执行：解码图像并分析视觉特征
+        :return: (预处理后的图像数组或None, 视觉特征字典, 错误信息或None)
+        """
+        try:
+            img_path = DecodedImage.ensure(img_path)
+            visual_features = self.analyze_visual_features(img_path) if with_visual_features else {}
+        except Exception as e:
+            return None, {}, f'图像读取失败: {str(e)}'
+        if self.model is None:
+            return None, visual_features, None
+        try:
+            return self.preprocess_image(img_path)[0], visual_features, None
+        except Exception as e:
+            return None, visual_features, f'预测失败: {str(e)}'
+    
+    def predict_batch(self, img_paths, batch_size=16, max_workers=None, with_visual_features=True):
+        """
+        批量预测图像类别：并行解码图像，每批只执行一次前向计算
+        :param img_paths: 图像路径（或DecodedImage）列表
+        :param batch_size: 每批图像数量
+        :param max_workers: 解码线程数，默认由ThreadPoolExecutor决定
+        :param with_visual_features: 是否同时分析视觉特征
+        :return: 与输入顺序一致的结果列表，每项与predict返回的字典结构相同
+        """
+        img_paths = list(img_paths)
+        batches = [img_paths[i:i + batch_size] for i in range(0, len(img_paths), batch_size)]
+        results = []
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def submit(batch):
+                return [executor.submit(self._prepare_batch_item, path, with_visual_features) for path in batch]
+            
+            # 预先提交下一批的解码任务，使解码与前向计算重叠
+            pending = submit(batches[0]) if batches else []
+            for index in range(len(batches)):
+                current = pending
+                pending = submit(batches[index + 1]) if index + 1 < len(batches) else []
+                items = [future.result() for future in current]
+                
+                if self.model is None:
+                    results.extend(
+                        self._fallback_result(features, error or '模型未加载，无法进行图像分类')
+                        for _, features, error in items
+                    )
+                    continue
+                
+                valid = [i for i, (array, _, _) in enumerate(items) if array is not None]
+                predictions = {}
+                if valid:
+                    batch_array = np.stack([items[i][0] for i in valid])
+                    try:
+                        outputs = self._forward(batch_array)
+                        predictions = {i: np.asarray(outputs[row]) for row, i in enumerate(valid)}
+                    except Exception as e:
+                        print(f"批量预测失败: {str(e)}")
+                        items = [(array, features, error or f'预测失败: {str(e)}') for array, features, error in items]
+                
+                for i, (_, features, error) in enumerate(items):
+                    if i in predictions:
+                        results.append(self._build_result(predictions[i], features))
+                    else:
+                        results.append(self._fallback_result(features, error))
+        
+        return results
+
+# 进程内共享的图像识别工具：模型只加载一次，并发调用方等待同一次加载
+_shared_tool = None
+_shared_tool_lock = threading.Lock()
+_model_load_lock = threading.Lock()
+_model_loaded = threading.Event()
+_model_load_error = None
+_model_load_failed_at = None
+_prewarm_thread = None
+
+# 加载失败后至少间隔多少秒再重试（部署时文件暂缺、内存不足等临时故障可以自动恢复）
+MODEL_LOAD_RETRY_INTERVAL = 30
+
+def get_shared_image_tool():
+    """
+    获取进程内共享的图像识别工具实例（只创建对象，不加载模型）
+    :return: ImageRecognitionTool实例
+    """
+    global _shared_tool
+    if _shared_tool is None:
+        with _shared_tool_lock:
+            if _shared_tool is None:
+                _shared_tool = ImageRecognitionTool()
+    return _shared_tool
+
+def ensure_image_model_loaded():
+    """
+    确保共享工具的模型已加载：第一个调用方负责加载，其余调用方阻塞等待，不会重复加载
+    加载失败时记录错误，距上次失败超过 MODEL_LOAD_RETRY_INTERVAL 秒后的调用会重新尝试
+    :return: 模型是否可用
+    """
+    global _model_load_error, _model_load_failed_at
+    tool = get_shared_image_tool()
+    if _model_loaded.is_set():
+        return True
+    
+    with _model_load_lock:
+        if _model_loaded.is_set():
+            return True
+        if _model_load_failed_at is not None and time.monotonic() - _model_load_failed_at < MODEL_LOAD_RETRY_INTERVAL:
+            # 刚刚失败过（包括等待同一次加载的并发调用方），暂不重试
+            return False
+        
+        try:
+            loaded = tool.load_model()
+            error = None if loaded else f"未找到可用的模型文件或模型加载失败: {tool.model_path}"
+        except Exception as e:
+            loaded, error = False, str(e)
+        
+        if loaded:
+            # 设置 PAPERCUT_MICRO_BATCHING=1 时并发请求合并成批推理，默认单张请求直接前向计算
+            if micro_batching_enabled():
+                tool.enable_batching()
+            _model_load_error = None
+            _model_load_failed_at = None
+            _model_loaded.set()
+        else:
+            _model_load_error = error
+            _model_load_failed_at = time.monotonic()
+        return loaded
+
+def prewarm_image_tool():
+    """
+    在后台线程中加载模型，不阻塞调用方
+    :return: 预热线程
+    """
+    global _prewarm_thread
+    with _shared_tool_lock:
+        # 上一次预热已结束但模型未加载成功时重新预热
+        if _prewarm_thread is None or (not _prewarm_thread.is_alive() and not _model_loaded.is_set()):
+            _prewarm_thread = threading.Thread(target=ensure_image_model_loaded, name='image-model-prewarm', daemon=True)
+            _prewarm_thread.start()
+    return _prewarm_thread
+
+def image_tool_status():
+    """
+    共享模型的就绪状态
+    :return: 'not_loaded'（尚未开始加载）、'loading'、'ready' 或 'unavailable'（加载失败或找不到模型文件）
+    """
+    if _model_loaded.is_set():
+        return 'ready'
+    if _model_load_lock.locked():
+        return 'loading'
+    if _model_load_error is not None:
+        return 'unavailable'
+    return 'not_loaded'
+
+def image_tool_error():
+    """
+    最近一次模型加载失败的原因，没有失败或已加载成功时返回None
+    """
+    return _model_load_error
 
 # 示例用法
 if __name__ == "__main__":
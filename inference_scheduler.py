@@ -0,0 +1,153 @@
+# 动态微批调度：把短时间窗口内到达的并发推理请求合并成一批，只执行一次前向计算
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+def micro_batching_enabled():
+    """
+    是否为共享的推理工具启用微批（环境变量 PAPERCUT_MICRO_BATCHING=1）
+    默认关闭：交互式单张请求不需要等待收集窗口，也不需要切换到调度线程；高并发部署时再开启
+    """
+    return os.environ.get("PAPERCUT_MICRO_BATCHING") == "1"
+
+
+class MicroBatchScheduler:
+    """
+    微批推理调度器：
+    - 第一个请求到达后最多等待 max_wait_ms，或凑满 max_batch_size 个请求后立即执行
+    - batch_fn 接收输入列表，返回等长的结果列表，每个调用方通过Future取回自己的结果
+    """
+    def __init__(self, batch_fn, max_batch_size=16, max_wait_ms=10, name='inference'):
+        """
+        :param batch_fn: 批量推理函数，输入列表 -> 结果列表（顺序一致）
+        :param max_batch_size: 每批最多合并的请求数
+        :param max_wait_ms: 收集请求的时间窗口（毫秒）
+        :param name: 调度线程名称
+        """
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._closed = False
+        self._metrics_lock = threading.Lock()
+        self._requests = 0
+        self._batches = 0
+        self._max_queue_depth = 0
+        self._batch_sizes = {}
+        self._last_batch_ms = 0.0
+        self._thread = threading.Thread(target=self._run, name=f"{name}-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, item):
+        """
+        提交一个推理请求
+        :param item: 单个输入
+        :return: concurrent.futures.Future，结果为该输入对应的输出
+        """
+        if self._closed:
+            raise RuntimeError("推理调度器已关闭")
+        future = Future()
+        self._queue.put((item, future))
+        depth = self._queue.qsize()
+        with self._metrics_lock:
+            self._requests += 1
+            self._max_queue_depth = max(self._max_queue_depth, depth)
+        return future
+
+    def __call__(self, item, timeout=None):
+        """
+        提交请求并等待结果
+        """
+        return self.submit(item).result(timeout)
+
+    def _collect(self, first):
+        """
+        从第一个请求开始，在时间窗口内继续收集请求
+        :return: (请求列表, 是否收到停止信号)
+        """
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is _STOP:
+                return batch, True
+            batch.append(request)
+        return batch, False
+
+    def _run(self):
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch, stop = self._collect(first)
+            self._execute(batch)
+            if stop:
+                break
+        # 关闭后仍在队列中的请求直接返回错误
+        while True:
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if request is not _STOP:
+                request[1].set_exception(RuntimeError("推理调度器已关闭"))
+
+    def _execute(self, batch):
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        start = time.perf_counter()
+        try:
+            outputs = list(self.batch_fn([item for item, _ in batch]))
+            if len(outputs) != len(batch):
+                raise ValueError(f"批量推理返回 {len(outputs)} 个结果，期望 {len(batch)} 个")
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+        else:
+            for (_, future), output in zip(batch, outputs):
+                future.set_result(output)
+
+        with self._metrics_lock:
+            self._batches += 1
+            self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._last_batch_ms = (time.perf_counter() - start) * 1000
+
+    def metrics(self):
+        """
+        调度指标
+        :return: 包含队列深度、批次数量和批大小分布的字典
+        """
+        with self._metrics_lock:
+            batched = sum(size * count for size, count in self._batch_sizes.items())
+            return {
+                'queue_depth': self._queue.qsize(),
+                'max_queue_depth': self._max_queue_depth,
+                'requests': self._requests,
+                'batches': self._batches,
+                'avg_batch_size': batched / self._batches if self._batches else 0.0,
+                'batch_size_histogram': dict(sorted(self._batch_sizes.items())),
+                'last_batch_ms': self._last_batch_ms
+            }
+
+    def close(self, timeout=None):
+        """
+        停止调度线程，已入队的请求先执行完当前批次
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
@@ -9,6 +9,9 @@ dataset_root = "."
 # 类别列表
 categories = ["人物类", "动物类", "抽象类", "花样类", "花草植物类"]
 
+# 每批标注的图像数量
+batch_size = 16
+
 # 创建标注工具实例
 annotation_tool = MultiDimensionalAnnotationTool()
 
@@ -41,26 +44,24 @@ for category in categories:
     
     total_images += len(image_files)
     
-    # 处理每张图像
-    for image_path in image_files:
-        try:
-            print(f"\n处理图像：{image_path}")
-            
-            # 进行多维标注
-            annotation_result = annotation_tool.annotate(image_path)
-            
-            # 添加类别信息
-            annotation_result["category"] = category
-            
-            # 保存到对应类别
-            all_annotations[category].append(annotation_result)
-            
-            processed_images += 1
-            print(f"已处理 {processed_images}/{total_images} 张图像")
-            
-        except Exception as e:
-            print(f"处理图像 {image_path} 失败：{str(e)}")
+    # 批量进行多维标注：并行预处理，每批只做一次CLIP图像编码
+    annotation_results = annotation_tool.annotate_batch(image_files, batch_size=batch_size)
+    
+    # 处理每张图像的标注结果
+    for image_path, annotation_result in zip(image_files, annotation_results):
+        if "error" in annotation_result:
+            print(f"处理图像 {image_path} 失败：{annotation_result['error']}")
             continue
+        
+        # 添加类别信息
+        annotation_result["category"] = category
+        
+        # 保存到对应类别
+        all_annotations[category].append(annotation_result)
+        
+        processed_images += 1
+    
+    print(f"已处理 {processed_images}/{total_images} 张图像")
 
 # 保存所有标注结果到JSON文件
 with open("dataset_annotations.json", "w", encoding="utf-8") as f:
@@ -0,0 +1,281 @@
+# 知识库SQLite存储后端：规范化表 + FTS5全文索引，适合数万条纹样规模，不需要把全部记录常驻内存
+import json
+import os
+import sqlite3
+import threading
+
+from knowledge_store import DEFAULT_DATABASE_PATH, default_cache_path, load_snapshot, pattern_region_ids, source_sha256
+from search_index import SEARCH_FIELDS, field_values, segment_ngrams, split_segments
+
+SCHEMA_VERSION = '1'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS regions (
+    seq INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    name TEXT,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS patterns (
+    seq INTEGER PRIMARY KEY,
+    id TEXT UNIQUE NOT NULL,
+    name TEXT NOT NULL,
+    doc TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_patterns_name ON patterns(name);
+CREATE TABLE IF NOT EXISTS pattern_aliases (
+    pattern_seq INTEGER NOT NULL REFERENCES patterns(seq),
+    alias TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pattern_aliases_alias ON pattern_aliases(alias);
+CREATE TABLE IF NOT EXISTS pattern_regions (
+    pattern_seq INTEGER NOT NULL REFERENCES patterns(seq),
+    region_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pattern_regions_region ON pattern_regions(region_id);
+CREATE TABLE IF NOT EXISTS combinations (
+    seq INTEGER PRIMARY KEY,
+    id TEXT,
+    name TEXT,
+    doc TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS combination_patterns (
+    combination_seq INTEGER NOT NULL REFERENCES combinations(seq),
+    pattern_id TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_combination_patterns_pattern ON combination_patterns(pattern_id);
+CREATE VIRTUAL TABLE IF NOT EXISTS patterns_fts USING fts5(
+    {fts_columns},
+    content='',
+    tokenize='unicode61'
+);
+""".format(fts_columns=', '.join(SEARCH_FIELDS))
+
+_DATA_TABLES = ('pattern_aliases', 'pattern_regions', 'combination_patterns', 'combinations', 'patterns', 'regions')
+
+
+def _ngram_text(values):
+    """
+    将字段文本转换为以空格分隔的n-gram串，交给FTS5的unicode61分词器按空格切分
+    """
+    grams = []
+    for value in values:
+        for segment in split_segments(value):
+            grams.extend(segment_ngrams(segment, (1, 2, 3)))
+    return ' '.join(grams)
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _fts_query(keyword):
+    """
+    构建FTS5查询：多字片段要求全部二元组命中，三元组用于提升连续命中的得分
+    """
+    required = []
+    boosting = []
+    for segment in split_segments(keyword):
+        if len(segment) == 1:
+            required.append(segment)
+        else:
+            required.extend(segment_ngrams(segment, (2,)))
+            boosting.extend(segment_ngrams(segment, (3,)))
+    if not required:
+        return None
+
+    query = ' AND '.join(_fts_phrase(term) for term in dict.fromkeys(required))
+    if boosting:
+        query += ' AND (' + ' OR '.join(_fts_phrase(term) for term in dict.fromkeys(required + boosting)) + ')'
+    return query
+
+
+class SQLiteKnowledgeBackend:
+    """
+    基于SQLite的知识库后端，接口与KnowledgeBase保持一致，可直接作为KnowledgeTool的backend
+    """
+    def __init__(self, sqlite_path=None, database_path=DEFAULT_DATABASE_PATH):
+        """
+        初始化SQLite后端
+        :param sqlite_path: SQLite文件路径，默认放在知识库源文件旁的缓存目录
+        :param database_path: 知识库源文件路径；源文件变化时自动重新导入，为None时直接使用已有的SQLite文件
+        """
+        if sqlite_path is None:
+            sqlite_path = default_cache_path(database_path or DEFAULT_DATABASE_PATH, '.sqlite3')
+        self.sqlite_path = sqlite_path
+        self.database_path = database_path
+        self._local = threading.local()
+
+        directory = os.path.dirname(os.path.abspath(sqlite_path))
+        os.makedirs(directory, exist_ok=True)
+        self._connection().executescript(_SCHEMA)
+        if database_path is not None:
+            self._sync_from_source()
+
+    def _connection(self):
+        """
+        每个线程使用独立的连接（Streamlit在多个线程中执行脚本）
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.sqlite_path)
+            self._local.connection = connection
+        return connection
+
+    def _meta(self, key):
+        row = self._connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    @property
+    def version(self):
+        return self._meta('source_sha256')
+
+    def _sync_from_source(self):
+        """
+        源文件内容哈希与库中记录不一致时，重新导入全部数据
+        """
+        if not os.path.exists(self.database_path):
+            raise FileNotFoundError(f"知识库文件不存在: {self.database_path}")
+
+        current_sha256 = source_sha256(self.database_path)
+        if self._meta('source_sha256') == current_sha256 and self._meta('schema_version') == SCHEMA_VERSION:
+            return
+
+        snapshot = load_snapshot(self.database_path)
+        self.import_data(snapshot['data'], snapshot['source_sha256'])
+        print(f"知识库已导入SQLite: {self.sqlite_path}")
+
+    def import_data(self, data, version=None):
+        """
+        将知识库数据导入SQLite（在单个事务中替换全部数据）
+        :param data: 知识库数据字典（顶层包含 knowledge_base 键）
+        :param version: 知识库版本标识
+        """
+        knowledge_base = data['knowledge_base']
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            for table in _DATA_TABLES:
+                connection.execute(f"DELETE FROM {table}")
+            # contentless FTS5表不支持DELETE，使用delete-all命令清空
+            connection.execute("INSERT INTO patterns_fts (patterns_fts) VALUES ('delete-all')")
+
+            for region in knowledge_base.get('regions', []):
+                connection.execute(
+                    "INSERT INTO regions (id, name, doc) VALUES (?, ?, ?)",
+                    (region['id'], region.get('name'), json.dumps(region, ensure_ascii=False))
+                )
+
+            for pattern in knowledge_base.get('patterns', []):
+                cursor = connection.execute(
+                    "INSERT INTO patterns (id, name, doc) VALUES (?, ?, ?)",
+                    (pattern['id'], pattern['name'], json.dumps(pattern, ensure_ascii=False))
+                )
+                seq = cursor.lastrowid
+                connection.executemany(
+                    "INSERT INTO pattern_aliases (pattern_seq, alias) VALUES (?, ?)",
+                    [(seq, alias) for alias in pattern.get('aliases', [])]
+                )
+                connection.executemany(
+                    "INSERT INTO pattern_regions (pattern_seq, region_id) VALUES (?, ?)",
+                    [(seq, region_id) for region_id in pattern_region_ids(pattern)]
+                )
+                fts_values = [_ngram_text(field_values(pattern, field)) for field in SEARCH_FIELDS]
+                connection.execute(
+                    f"INSERT INTO patterns_fts (rowid, {', '.join(SEARCH_FIELDS)}) "
+                    f"VALUES (?, {', '.join('?' for _ in SEARCH_FIELDS)})",
+                    [seq] + fts_values
+                )
+
+            for combination in knowledge_base.get('pattern_combinations', []):
+                cursor = connection.execute(
+                    "INSERT INTO combinations (id, name, doc) VALUES (?, ?, ?)",
+                    (combination.get('combination_id'), combination.get('name'),
+                     json.dumps(combination, ensure_ascii=False))
+                )
+                connection.executemany(
+                    "INSERT INTO combination_patterns (combination_seq, pattern_id) VALUES (?, ?)",
+                    [(cursor.lastrowid, pattern_id) for pattern_id in combination.get('patterns', [])]
+                )
+
+            connection.executemany(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+                [('source_sha256', version), ('schema_version', SCHEMA_VERSION)]
+            )
+
+    def _docs(self, sql, params=()):
+        return [json.loads(row[0]) for row in self._connection().execute(sql, params)]
+
+    @property
+    def patterns(self):
+        """
+        全部纹样（会读取整张表，大规模数据请使用 patterns_page）
+        """
+        return self._docs("SELECT doc FROM patterns ORDER BY seq")
+
+    @property
+    def regions(self):
+        return self._docs("SELECT doc FROM regions ORDER BY seq")
+
+    @property
+    def pattern_combinations(self):
+        return self._docs("SELECT doc FROM combinations ORDER BY seq")
+
+    def pattern_by_id(self, pattern_id):
+        docs = self._docs("SELECT doc FROM patterns WHERE id = ?", (pattern_id,))
+        return docs[0] if docs else None
+
+    def patterns_by_name(self, name):
+        return self._docs(
+            "SELECT doc FROM patterns WHERE name = ? "
+            "OR seq IN (SELECT pattern_seq FROM pattern_aliases WHERE alias = ?) ORDER BY seq",
+            (name, name)
+        )
+
+    def patterns_by_region(self, region_id):
+        return self._docs(
+            "SELECT doc FROM patterns WHERE seq IN "
+            "(SELECT pattern_seq FROM pattern_regions WHERE region_id = ?) ORDER BY seq",
+            (region_id,)
+        )
+
+    def region_by_id(self, region_id):
+        docs = self._docs("SELECT doc FROM regions WHERE id = ?", (region_id,))
+        return docs[0] if docs else None
+
+    def search_patterns(self, keyword, limit=None):
+        """
+        使用FTS5检索纹样，按bm25得分排序
+        :param keyword: 搜索关键词
+        :param limit: 返回结果数量上限，None表示全部
+        :return: 纹样信息列表
+        """
+        query = _fts_query(keyword)
+        limit = -1 if limit is None else limit
+        if query is None:
+            return self._docs("SELECT doc FROM patterns ORDER BY seq LIMIT ?", (limit,))
+
+        weights = ', '.join(str(weight) for weight in SEARCH_FIELDS.values())
+        return self._docs(
+            f"SELECT p.doc FROM patterns_fts JOIN patterns p ON p.seq = patterns_fts.rowid "
+            f"WHERE patterns_fts MATCH ? ORDER BY bm25(patterns_fts, {weights}), p.seq LIMIT ?",
+            (query, limit)
+        )
+
+    def patterns_page(self, cursor=None, limit=50):
+        """
+        游标分页读取纹样
+        :param cursor: 上一页返回的游标，None表示从头开始
+        :param limit: 每页数量
+        :return: (纹样信息列表, 下一页游标)，没有更多数据时游标为None
+        """
+        rows = self._connection().execute(
+            "SELECT seq, doc FROM patterns WHERE seq > ? ORDER BY seq LIMIT ?",
+            (int(cursor or 0), limit)
+        ).fetchall()
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        return [json.loads(doc) for _, doc in rows], next_cursor
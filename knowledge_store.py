@@ -0,0 +1,455 @@
+# 知识库存储模块：将 json_database.py 编译为二进制快照，避免每次启动都重新解析
+import ast
+import hashlib
+import os
+import pickle
+import threading
+import time
+
+from search_index import PatternSearchIndex
+
+# 快照格式版本，修改快照结构时递增，旧快照会被自动重建
+SNAPSHOT_FORMAT_VERSION = 1
+
+DEFAULT_DATABASE_PATH = 'json_database.py'
+CACHE_DIR_NAME = '.papercut_cache'
+
+# 纹样数据中区域字段有三种写法：单个region_id，或regions / region_ids列表
+REGION_KEYS = ('region_id', 'regions', 'region_ids')
+
+
+def parse_database_source(content):
+    """
+    从知识库源文件内容中解析出data字典
+    :param content: json_database.py 的文本内容
+    :return: 知识库数据字典
+    """
+    data_start = content.find('data = {')
+    if data_start == -1:
+        raise ValueError("无法找到知识库数据")
+
+    data_start += len('data = ')
+    return ast.literal_eval(content[data_start:])
+
+
+def default_cache_path(database_path, suffix):
+    """
+    获取与知识库源文件对应的缓存文件路径（与源文件同目录下的缓存目录）
+    :param database_path: 知识库文件路径
+    :param suffix: 缓存文件后缀，如 '.snapshot'
+    :return: 缓存文件路径
+    """
+    source_dir = os.path.dirname(os.path.abspath(database_path))
+    file_name = os.path.basename(database_path) + suffix
+    return os.path.join(source_dir, CACHE_DIR_NAME, file_name)
+
+
+def default_snapshot_path(database_path):
+    """
+    获取知识库快照的默认路径
+    :param database_path: 知识库文件路径
+    :return: 快照文件路径
+    """
+    return default_cache_path(database_path, '.snapshot')
+
+
+def source_sha256(database_path):
+    """
+    计算知识库源文件的内容哈希
+    :param database_path: 知识库文件路径
+    :return: 十六进制SHA-256字符串
+    """
+    with open(database_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _read_snapshot(snapshot_path):
+    """
+    读取快照文件，文件缺失或损坏时返回None
+    """
+    try:
+        with open(snapshot_path, 'rb') as f:
+            snapshot = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+
+    if not isinstance(snapshot, dict) or snapshot.get('format_version') != SNAPSHOT_FORMAT_VERSION:
+        return None
+    return snapshot
+
+
+def _write_snapshot(snapshot, snapshot_path):
+    """
+    原子地写入快照文件：先写临时文件再替换，避免并发读取到半写入的快照
+    """
+    try:
+        os.makedirs(os.path.dirname(snapshot_path), exist_ok=True)
+        tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, snapshot_path)
+        return True
+    except OSError as e:
+        print(f"写入知识库快照失败: {str(e)}")
+        return False
+
+
+def compile_snapshot(database_path=DEFAULT_DATABASE_PATH, snapshot_path=None):
+    """
+    解析知识库源文件并写入二进制快照
+    :param database_path: 知识库文件路径
+    :param snapshot_path: 快照文件路径，默认使用 default_snapshot_path
+    :return: 快照字典，包含 data、source_sha256 等字段
+    """
+    if not os.path.exists(database_path):
+        raise FileNotFoundError(f"知识库文件不存在: {database_path}")
+
+    snapshot_path = snapshot_path or default_snapshot_path(database_path)
+
+    with open(database_path, 'rb') as f:
+        raw = f.read()
+    stat = os.stat(database_path)
+
+    snapshot = {
+        'format_version': SNAPSHOT_FORMAT_VERSION,
+        'source_sha256': hashlib.sha256(raw).hexdigest(),
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_size': stat.st_size,
+        'data': parse_database_source(raw.decode('utf-8')),
+    }
+    _write_snapshot(snapshot, snapshot_path)
+    return snapshot
+
+
+def load_snapshot(database_path=DEFAULT_DATABASE_PATH, snapshot_path=None):
+    """
+    加载知识库快照，仅当源文件发生变化时才重新编译
+    先比较源文件的mtime和大小，不一致时再比较内容哈希，内容未变则只刷新快照中的文件元信息
+    :param database_path: 知识库文件路径
+    :param snapshot_path: 快照文件路径，默认使用 default_snapshot_path
+    :return: 快照字典，包含 data、source_sha256 等字段
+    """
+    if not os.path.exists(database_path):
+        raise FileNotFoundError(f"知识库文件不存在: {database_path}")
+
+    snapshot_path = snapshot_path or default_snapshot_path(database_path)
+    snapshot = _read_snapshot(snapshot_path)
+    if snapshot is None:
+        return compile_snapshot(database_path, snapshot_path)
+
+    stat = os.stat(database_path)
+    if snapshot['source_mtime_ns'] == stat.st_mtime_ns and snapshot['source_size'] == stat.st_size:
+        return snapshot
+
+    if source_sha256(database_path) != snapshot['source_sha256']:
+        return compile_snapshot(database_path, snapshot_path)
+
+    # 文件被touch但内容未变，更新元信息即可
+    snapshot['source_mtime_ns'] = stat.st_mtime_ns
+    snapshot['source_size'] = stat.st_size
+    _write_snapshot(snapshot, snapshot_path)
+    return snapshot
+
+
+class FrozenDict(dict):
+    """
+    只读字典：知识库在进程内共享，禁止调用方原地修改
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("知识库数据为只读，请先调用copy()再修改")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def pattern_region_ids(pattern):
+    """
+    获取纹样关联的全部区域ID，兼容 region_id、regions、region_ids 三种字段
+    :param pattern: 纹样信息字典
+    :return: 区域ID列表（保持出现顺序，已去重）
+    """
+    region_ids = []
+    for key in REGION_KEYS:
+        value = pattern.get(key)
+        if not value:
+            continue
+        values = [value] if isinstance(value, str) else value
+        for region_id in values:
+            if region_id not in region_ids:
+                region_ids.append(region_id)
+    return region_ids
+
+
+def freeze(obj):
+    """
+    递归地将字典转换为FrozenDict、列表转换为元组
+    :param obj: 任意由dict/list/基本类型组成的数据
+    :return: 只读版本的数据
+    """
+    if isinstance(obj, dict):
+        return FrozenDict((key, freeze(value)) for key, value in obj.items())
+    if isinstance(obj, (list, tuple)):
+        return tuple(freeze(item) for item in obj)
+    return obj
+
+
+class KnowledgeBase:
+    """
+    只读的知识库对象，同一进程内按源文件路径共享一份
+    """
+    def __init__(self, data, version=None, source_path=None):
+        """
+        初始化知识库
+        :param data: 知识库数据字典（顶层包含 knowledge_base 键）
+        :param version: 知识库版本标识（源文件哈希）
+        :param source_path: 知识库源文件路径
+        """
+        self._data = freeze(data)
+        self._version = version
+        self._source_path = source_path
+        self._search_index = None
+        self._build_indexes()
+
+    def _build_indexes(self):
+        """
+        构建ID、名称/别名、区域的哈希索引，使查询为O(1)
+        """
+        pattern_by_id = {}
+        patterns_by_name = {}
+        patterns_by_region = {}
+        for pattern in self.patterns:
+            pattern_by_id.setdefault(pattern['id'], pattern)
+
+            names = [pattern['name']] + list(pattern.get('aliases', ()))
+            for name in dict.fromkeys(names):
+                patterns_by_name.setdefault(name, []).append(pattern)
+
+            for region_id in pattern_region_ids(pattern):
+                patterns_by_region.setdefault(region_id, []).append(pattern)
+
+        self._pattern_by_id = pattern_by_id
+        self._patterns_by_name = {key: tuple(value) for key, value in patterns_by_name.items()}
+        self._patterns_by_region = {key: tuple(value) for key, value in patterns_by_region.items()}
+        self._region_by_id = {region['id']: region for region in self.regions}
+
+    @classmethod
+    def from_source(cls, database_path=DEFAULT_DATABASE_PATH):
+        """
+        从知识库源文件（经由二进制快照）构建知识库对象
+        :param database_path: 知识库文件路径
+        :return: KnowledgeBase实例
+        """
+        snapshot = load_snapshot(database_path)
+        return cls(snapshot['data'], snapshot['source_sha256'], database_path)
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def version(self):
+        return self._version
+
+    @property
+    def source_path(self):
+        return self._source_path
+
+    @property
+    def patterns(self):
+        return self._data['knowledge_base']['patterns']
+
+    @property
+    def regions(self):
+        return self._data['knowledge_base']['regions']
+
+    @property
+    def pattern_combinations(self):
+        return self._data['knowledge_base'].get('pattern_combinations', ())
+
+    def pattern_by_id(self, pattern_id):
+        """
+        根据纹样ID查询纹样
+        :param pattern_id: 纹样ID
+        :return: 纹样信息字典，未找到返回None
+        """
+        return self._pattern_by_id.get(pattern_id)
+
+    def patterns_by_name(self, name):
+        """
+        根据纹样名称或别名查询纹样
+        :param name: 纹样名称或别名
+        :return: 纹样信息元组，未找到返回空元组
+        """
+        return self._patterns_by_name.get(name, ())
+
+    def patterns_by_region(self, region_id):
+        """
+        查询某区域的纹样
+        :param region_id: 区域ID
+        :return: 纹样信息元组，未找到返回空元组
+        """
+        return self._patterns_by_region.get(region_id, ())
+
+    @property
+    def search_index(self):
+        """
+        纹样全文倒排索引，首次检索时构建
+        """
+        if self._search_index is None:
+            self._search_index = PatternSearchIndex(self.patterns)
+        return self._search_index
+
+    def search_patterns(self, keyword, limit=None):
+        """
+        全文检索纹样
+        :param keyword: 搜索关键词
+        :param limit: 返回结果数量上限，None表示全部
+        :return: 按相关度排序的纹样信息列表
+        """
+        return [pattern for pattern, _ in self.search_index.search(keyword, limit)]
+
+    def patterns_page(self, cursor=None, limit=50):
+        """
+        游标分页读取纹样
+        :param cursor: 上一页返回的游标，None表示从头开始
+        :param limit: 每页数量
+        :return: (纹样信息列表, 下一页游标)，没有更多数据时游标为None
+        """
+        start = int(cursor or 0)
+        page = list(self.patterns[start:start + limit])
+        next_cursor = start + limit if start + limit < len(self.patterns) else None
+        return page, next_cursor
+
+    def region_by_id(self, region_id):
+        """
+        根据区域ID查询区域信息
+        :param region_id: 区域ID
+        :return: 区域信息字典，未找到返回None
+        """
+        return self._region_by_id.get(region_id)
+
+
+def _file_signature(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class KnowledgeBaseHolder:
+    """
+    可热更新的知识库持有者：定期检查源文件的mtime，变化时在后台线程重建知识库和索引，
+    构建完成后整体替换引用，读取方始终拿到完整的某一版本
+    """
+    def __init__(self, database_path=DEFAULT_DATABASE_PATH, check_interval=1.0):
+        """
+        初始化并同步加载第一版知识库
+        :param database_path: 知识库文件路径
+        :param check_interval: 两次检查源文件的最小间隔（秒）
+        """
+        self.database_path = database_path
+        self.check_interval = check_interval
+        self._signature = _file_signature(database_path)
+        self._current = KnowledgeBase.from_source(database_path)
+        self._last_check = time.monotonic()
+        self._reload_lock = threading.Lock()
+        self._reload_thread = None
+
+    def current(self):
+        """
+        获取当前版本的知识库，必要时触发后台重载（本次调用仍返回旧版本）
+        :return: KnowledgeBase实例
+        """
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._check_source()
+        return self._current
+
+    def _check_source(self):
+        try:
+            signature = _file_signature(self.database_path)
+        except OSError:
+            # 源文件暂时不可读（如编辑器正在保存），继续使用旧版本
+            return
+        if signature == self._signature:
+            return
+
+        with self._reload_lock:
+            if self._reload_thread is not None and self._reload_thread.is_alive():
+                return
+            self._reload_thread = threading.Thread(target=self._reload, args=(signature,), daemon=True)
+            self._reload_thread.start()
+
+    def _reload(self, signature):
+        try:
+            if source_sha256(self.database_path) == self._current.version:
+                # 文件被touch但内容未变
+                self._signature = signature
+                return
+            knowledge_base = KnowledgeBase.from_source(self.database_path)
+            # 在替换前构建好全文索引，避免读取方在新版本上首次检索时等待
+            knowledge_base.search_index
+            self._current = knowledge_base
+            self._signature = signature
+            print(f"知识库已重新加载: {self.database_path}")
+        except Exception as e:
+            print(f"重新加载知识库失败，继续使用旧版本: {str(e)}")
+
+    def reload(self):
+        """
+        立即同步检查并重载知识库
+        :return: 重载后的KnowledgeBase实例
+        """
+        self._reload(_file_signature(self.database_path))
+        return self._current
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def get_knowledge_base_holder(database_path=DEFAULT_DATABASE_PATH):
+    """
+    获取进程内共享的知识库持有者，同一源文件只创建一个
+    :param database_path: 知识库文件路径
+    :return: KnowledgeBaseHolder实例
+    """
+    key = os.path.abspath(database_path)
+    holder = _registry.get(key)
+    if holder is not None:
+        return holder
+
+    with _registry_lock:
+        holder = _registry.get(key)
+        if holder is None:
+            holder = KnowledgeBaseHolder(database_path)
+            _registry[key] = holder
+            print(f"成功加载知识库: {database_path}")
+    return holder
+
+
+def get_knowledge_base(database_path=DEFAULT_DATABASE_PATH):
+    """
+    获取进程内共享的当前版本知识库对象，源文件修改后会自动热更新
+    :param database_path: 知识库文件路径
+    :return: KnowledgeBase实例
+    """
+    return get_knowledge_base_holder(database_path).current()
+
+
+if __name__ == "__main__":
+    import sys
+
+    source = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_DATABASE_PATH
+    target = sys.argv[2] if len(sys.argv) > 2 else None
+    result = compile_snapshot(source, target)
+    print(f"知识库快照已生成: {target or default_snapshot_path(source)}")
+    print(f"源文件哈希: {result['source_sha256']}")
@@ -1,42 +1,62 @@
 import json
 import os
 
+from knowledge_store import get_knowledge_base_holder
+
 class KnowledgeTool:
-    def __init__(self, database_path='json_database.py'):
+    def __init__(self, database_path='json_database.py', backend='memory', sqlite_path=None):
         """
         初始化知识查询工具
         :param database_path: 知识库文件路径
+        :param backend: 存储后端，'memory'（进程内共享知识库）、'sqlite'（SQLite + FTS5），或自定义后端实例
+        :param sqlite_path: SQLite文件路径，仅backend='sqlite'时使用，默认放在缓存目录
         """
         self.database_path = database_path
-        self.knowledge_base = None
+        self.backend_type = backend
+        self.sqlite_path = sqlite_path
+        self._holder = None
+        self._backend = None
         self._load_database()
     
+    @property
+    def backend(self):
+        """
+        当前使用的存储后端；内存后端每次读取都会取到热更新后的最新版本
+        """
+        if self._holder is not None:
+            return self._holder.current()
+        return self._backend
+    
+    @property
+    def knowledge_base(self):
+        """
+        知识库原始数据（仅内存后端可用，其他后端返回None）
+        """
+        return getattr(self.backend, 'data', None)
+    
+    @property
+    def version(self):
+        """
+        知识库版本标识（源文件哈希）
+        """
+        backend = self.backend
+        return backend.version if backend is not None else None
+    
     def _load_database(self):
         """
         加载知识库数据
         """
         try:
-            if not os.path.exists(self.database_path):
-                raise FileNotFoundError(f"知识库文件不存在: {self.database_path}")
-            
-            # 读取文件内容
-            with open(self.database_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # 提取JSON数据
-            # 找到data = { ... }部分
-            data_start = content.find('data = {')
-            if data_start == -1:
-                raise ValueError("无法找到知识库数据")
-            
-            data_start += len('data = ')
-            
-            # 解析JSON数据
-            # 这里我们需要将Python字典转换为JSON字符串格式
-            import ast
-            self.knowledge_base = ast.literal_eval(content[data_start:])
-            
-            print(f"成功加载知识库: {self.database_path}")
+            if self.backend_type == 'memory':
+                # 使用进程内共享、可热更新的知识库，避免每个工具各自解析一份
+                self._holder = get_knowledge_base_holder(self.database_path)
+            elif self.backend_type == 'sqlite':
+                from knowledge_sqlite import SQLiteKnowledgeBackend
+                self._backend = SQLiteKnowledgeBackend(self.sqlite_path, self.database_path)
+            elif isinstance(self.backend_type, str):
+                raise ValueError(f"未知的知识库后端: {self.backend_type}")
+            else:
+                self._backend = self.backend_type
         except Exception as e:
             print(f"加载知识库失败: {str(e)}")
             raise
@@ -47,13 +67,10 @@ class KnowledgeTool:
         :param pattern_id: 纹样ID
         :return: 纹样信息字典，如果未找到返回None
         """
-        if not self.knowledge_base:
+        if self.backend is None:
             raise ValueError("知识库未加载")
         
-        for pattern in self.knowledge_base['knowledge_base']['patterns']:
-            if pattern['id'] == pattern_id:
-                return pattern
-        return None
+        return self.backend.pattern_by_id(pattern_id)
     
     def get_pattern_by_name(self, pattern_name):
         """
@@ -61,18 +78,11 @@ class KnowledgeTool:
         :param pattern_name: 纹样名称
         :return: 纹样信息列表，如果未找到返回空列表
         """
-        if not self.knowledge_base:
+        if self.backend is None:
             raise ValueError("知识库未加载")
         
-        results = []
-        for pattern in self.knowledge_base['knowledge_base']['patterns']:
-            if pattern['name'] == pattern_name:
-                results.append(pattern)
-            # 检查别名
-            if 'aliases' in pattern:
-                if pattern_name in pattern['aliases']:
-                    results.append(pattern)
-        return results
+        # 名称与别名共用同一索引
+        return list(self.backend.patterns_by_name(pattern_name))
     
     def get_patterns_by_region(self, region_id):
         """
@@ -80,14 +90,11 @@ class KnowledgeTool:
         :param region_id: 区域ID
         :return: 纹样信息列表，如果未找到返回空列表
         """
-        if not self.knowledge_base:
+        if self.backend is None:
             raise ValueError("知识库未加载")
         
-        results = []
-        for pattern in self.knowledge_base['knowledge_base']['patterns']:
-            if pattern['region_id'] == region_id:
-                results.append(pattern)
-        return results
+        # 索引已覆盖 region_id、regions、region_ids 三种字段
+        return list(self.backend.patterns_by_region(region_id))
     
     def get_region_info(self, region_id):
         """
@@ -95,13 +102,10 @@ class KnowledgeTool:
         :param region_id: 区域ID
         :return: 区域信息字典，如果未找到返回None
         """
-        if not self.knowledge_base:
+        if self.backend is None:
             raise ValueError("知识库未加载")
         
-        for region in self.knowledge_base['knowledge_base']['regions']:
-            if region['id'] == region_id:
-                return region
-        return None
+        return self.backend.region_by_id(region_id)
     
     def get_related_patterns(self, pattern_id):
         """
@@ -109,11 +113,13 @@ class KnowledgeTool:
         :param pattern_id: 纹样ID
         :return: 相关纹样信息列表，如果未找到返回空列表
         """
-        if not self.knowledge_base:
+        # 整个查询使用同一版本的知识库，避免中途热更新导致结果不一致
+        backend = self.backend
+        if backend is None:
             raise ValueError("知识库未加载")
         
         # 先找到当前纹样
-        current_pattern = self.get_pattern_by_id(pattern_id)
+        current_pattern = backend.pattern_by_id(pattern_id)
         if not current_pattern:
             return []
         
@@ -121,51 +127,69 @@ class KnowledgeTool:
         related_patterns = []
         if 'related_patterns' in current_pattern:
             for related_id in current_pattern['related_patterns']:
-                related_pattern = self.get_pattern_by_id(related_id)
+                related_pattern = backend.pattern_by_id(related_id)
                 if related_pattern:
                     related_patterns.append(related_pattern)
         
         return related_patterns
     
-    def search_patterns(self, keyword):
+    def search_patterns(self, keyword, limit=None):
         """
         根据关键词搜索纹样
+        检索名称、别名、外观描述、象征意义、文化背景和使用场景，按BM25相关度排序
         :param keyword: 搜索关键词
+        :param limit: 返回结果数量上限，None表示全部
         :return: 匹配的纹样信息列表
         """
-        if not self.knowledge_base:
+        if self.backend is None:
             raise ValueError("知识库未加载")
         
-        results = []
-        for pattern in self.knowledge_base['knowledge_base']['patterns']:
-            # 检查名称、别名、描述等字段
-            if (keyword in pattern['name'] or 
-                ('aliases' in pattern and any(keyword in alias for alias in pattern['aliases'])) or 
-                ('appearance_description' in pattern and keyword in pattern['appearance_description']) or 
-                ('symbolism' in pattern and any(keyword in item for item in pattern['symbolism']))):
-                results.append(pattern)
-        
-        return results
+        return list(self.backend.search_patterns(keyword, limit))
     
     def get_all_patterns(self):
         """
         获取所有纹样信息
         :return: 所有纹样信息列表
         """
-        if not self.knowledge_base:
+        if self.backend is None:
             raise ValueError("知识库未加载")
         
-        return self.knowledge_base['knowledge_base']['patterns']
+        return self.backend.patterns
     
     def get_all_regions(self):
         """
         获取所有区域信息
         :return: 所有区域信息列表
         """
-        if not self.knowledge_base:
+        if self.backend is None:
+            raise ValueError("知识库未加载")
+        
+        return self.backend.regions
+    
+    def get_patterns_page(self, cursor=None, limit=50):
+        """
+        分页获取纹样信息，避免一次性读取全部纹样
+        :param cursor: 上一页返回的游标，None表示从第一页开始
+        :param limit: 每页数量
+        :return: (纹样信息列表, 下一页游标)，没有更多数据时游标为None
+        """
+        if self.backend is None:
             raise ValueError("知识库未加载")
         
-        return self.knowledge_base['knowledge_base']['regions']
+        return self.backend.patterns_page(cursor, limit)
+    
+    def iter_patterns(self, page_size=50):
+        """
+        按页迭代全部纹样
+        :param page_size: 每页数量
+        :return: 纹样信息生成器
+        """
+        cursor = None
+        while True:
+            page, cursor = self.get_patterns_page(cursor, page_size)
+            yield from page
+            if cursor is None:
+                break
 
 # 示例用法
 if __name__ == "__main__":
@@ -1,5 +1,7 @@
 import os
 
+from conversation_memory import ConversationMemory
+
 # 检查依赖是否安装
 try:
     from agent import PapercutAgent
@@ -47,8 +49,8 @@ def main():
         print("3. 依赖版本不兼容")
         return
     
-    # 初始化对话历史
-    chat_history = ""
+    # 初始化对话历史：最近几轮原样保留，更早的轮次压缩为摘要，总量不超过token预算
+    chat_history = ConversationMemory(max_tokens=int(os.environ.get("PAPERCUT_HISTORY_TOKENS", "2000")))
     
     # 交互循环
     while True:
@@ -66,15 +68,16 @@ def main():
                 print("\n请输入有效的问题！")
                 continue
             
-            # 运行智能体
-            print("\n智能体正在思考，请稍候...")
-            response = agent.run(user_input, chat_history)
-            
-            # 打印智能体回答
-            print(f"\n智能体回答: {response}")
+            # 运行智能体，边生成边打印回答
+            print("\n智能体回答: ", end="", flush=True)
+            response = ""
+            for chunk in agent.run_stream(user_input, chat_history):
+                print(chunk, end="", flush=True)
+                response += chunk
+            print()
             
             # 更新对话历史
-            chat_history += f"用户: {user_input}\n智能体: {response}\n"
+            chat_history.add_turn(user_input, response)
             
         except KeyboardInterrupt:
             # 处理用户中断（Ctrl+C）
@@ -1,47 +1,38 @@
-# 尝试导入torch和clip，如果失败则设置标志
-HAS_TORCH = False
-try:
-    import torch
-    import clip
-    HAS_TORCH = True
-except ImportError:
-    torch = None
-    clip = None
+# torch和clip在首次使用CLIP时才导入，创建标注工具不会加载模型
+from clip_provider import CLIP_MODEL_NAME, HAS_CLIP, get_clip_model
 
 # 导入其他依赖
 from PIL import Image
 import numpy as np
 import json
-from json_database import data as knowledge_base
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from knowledge_store import get_knowledge_base, pattern_region_ids
 from image_tool import ImageRecognitionTool
+from decoded_image import DecodedImage
+from clip_text_cache import load_text_embeddings
+from result_cache import get_result_cache, result_cache_key
+from visual_features import FEATURES_VERSION
+from inference_scheduler import MicroBatchScheduler
 
 class MultiDimensionalAnnotationTool:
-    def __init__(self):
+    def __init__(self, result_cache=None):
         """
         初始化多维标注工具
+        :param result_cache: 结果缓存（ResultCache），None使用共享的默认缓存，False表示不缓存
         """
-        # 初始化基本属性
-        self.has_torch = HAS_TORCH
-        self.device = None
-        self.model = None
-        self.preprocess = None
-        
-        if self.has_torch:
-            # 只有在torch可用时才加载CLIP模型
-            self.device = "cuda" if torch.cuda.is_available() else "cpu"
-            self.model, self.preprocess = clip.load("ViT-B/32", device=self.device)
-            print(f"CLIP模型已加载，使用设备: {self.device}")
-        
-        # 初始化知识库和其他属性
-        self.knowledge_base = knowledge_base
-        self.patterns = self.knowledge_base["knowledge_base"]["patterns"]
-        self.regions = self.knowledge_base["knowledge_base"]["regions"]
-        
+        # 初始化基本属性，CLIP模型在首次匹配纹样时才加载
+        self.has_torch = HAS_CLIP
+        self._pattern_lock = threading.Lock()
+        self._pattern_version = None
+        self._pattern_labels = None
+        self._pattern_text_features = None
+        self.result_cache = get_result_cache() if result_cache is None else result_cache
+        self.scheduler = None
+        
+        # 知识库在每次使用时从共享持有者读取，热更新后自动使用新版本
         self.image_tool = ImageRecognitionTool()
         
-        if self.has_torch:
-            self.pattern_labels = self._prepare_pattern_labels()
-        
         self.pattern_categories = {
             "人物类": ["人物", "童子", "人物纹", "人物组合", "骑兽", "牧童", "娃娃"],
             "动物类": ["动物", "牛", "马", "麒麟", "瑞兽", "雁", "鸟", "鱼", "龙", "虎"],
@@ -58,12 +49,74 @@ class MultiDimensionalAnnotationTool:
             "锯齿": ["锯齿", "齿轮", "尖齿", "波浪边"]
         }
     
-    def _prepare_pattern_labels(self):
+    @property
+    def model(self):
+        """共享的CLIP模型（首次访问时加载）"""
+        return get_clip_model()[0]
+    
+    @property
+    def preprocess(self):
+        """CLIP图像预处理函数"""
+        return get_clip_model()[1]
+    
+    @property
+    def device(self):
+        """CLIP模型所在设备"""
+        return get_clip_model()[2]
+    
+    @property
+    def kb(self):
+        """当前版本的知识库（源文件修改后自动热更新）"""
+        return get_knowledge_base()
+    
+    @property
+    def knowledge_base(self):
+        return self.kb.data
+    
+    @property
+    def patterns(self):
+        return self.kb.data["knowledge_base"]["patterns"]
+    
+    @property
+    def regions(self):
+        return self.kb.data["knowledge_base"]["regions"]
+    
+    @property
+    def pattern_labels(self):
+        """当前知识库版本的纹样标签列表 [(纹样id, 描述)]"""
+        return self._pattern_index(with_features=False)[1]
+    
+    @property
+    def pattern_text_features(self):
+        """当前知识库版本的纹样标签文本嵌入，首次使用时计算"""
+        return self._pattern_index()[2]
+    
+    def _pattern_index(self, with_features=True):
+        """
+        获取同一知识库版本下的纹样标签和文本嵌入，知识库版本变化时重建标签并重新计算嵌入
+        :param with_features: 是否需要文本嵌入（需要时会加载CLIP模型）
+        :return: (知识库, 纹样标签列表, 文本嵌入或None)
+        """
+        kb = self.kb
+        with self._pattern_lock:
+            if self._pattern_labels is None or self._pattern_version != kb.version:
+                self._pattern_labels = self._prepare_pattern_labels(kb)
+                self._pattern_text_features = None
+                self._pattern_version = kb.version
+            if with_features and self._pattern_text_features is None:
+                # 纹样标签的文本嵌入持久化在磁盘上，标签或模型变化时自动失效
+                self._pattern_text_features = load_text_embeddings(
+                    self.model, [label[1] for label in self._pattern_labels], CLIP_MODEL_NAME, self.device
+                )
+            return kb, self._pattern_labels, self._pattern_text_features
+    
+    def _prepare_pattern_labels(self, kb):
         """
         准备纹样标签用于CLIP匹配
+        :param kb: 知识库
         """
         pattern_labels = []
-        for pattern in self.patterns:
+        for pattern in kb.data["knowledge_base"]["patterns"]:
             description = f"{pattern['name']}"
             if 'aliases' in pattern and pattern['aliases']:
                 description += f"，别名：{pattern['aliases'][0]}"
@@ -73,10 +126,11 @@ class MultiDimensionalAnnotationTool:
     def preprocess_image(self, img_path):
         """
         预处理图像用于CLIP模型
+        :param img_path: 图像路径或DecodedImage
         """
         if not self.has_torch:
             raise ValueError("torch is not available, cannot preprocess image")
-        image = self.preprocess(Image.open(img_path)).unsqueeze(0).to(self.device)
+        image = DecodedImage.ensure(img_path).clip_tensor(self.preprocess).unsqueeze(0).to(self.device)
         return image
     
     def _analyze_visual_content(self, img_path):
@@ -198,26 +252,73 @@ class MultiDimensionalAnnotationTool:
             # 没有torch时返回空列表或默认结果
             return []
         
-        image = self.preprocess_image(img_path)
-        
-        with torch.no_grad():
-            image_features = self.model.encode_image(image)
-            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+        if self.scheduler is not None:
+            # 启用微批时与其他并发请求合并编码
+            image = DecodedImage.ensure(img_path).clip_tensor(self.preprocess)
+            image_features = self.scheduler.submit(image).result().unsqueeze(0)
+        else:
+            image = self.preprocess_image(img_path)
+            image_features = self._encode_images(image)
+        return self._matches_from_features(image_features, top_k)[0]
+    
+    def enable_batching(self, max_batch_size=16, max_wait_ms=10):
+        """
+        启用动态微批：并发的CLIP图像编码请求在时间窗口内合并为一次前向计算
+        :param max_batch_size: 每批最多合并的图像数
+        :param max_wait_ms: 收集请求的时间窗口（毫秒）
+        :return: 调度器，没有torch时返回None
+        """
+        if self.scheduler is None and self.has_torch:
+            self.scheduler = MicroBatchScheduler(
+                self._encode_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms, name='clip-image'
+            )
+        return self.scheduler
+    
+    def _encode_batch(self, images):
+        """
+        调度器的批量编码函数
+        :param images: CLIP预处理后的单张图像张量列表
+        :return: 各图像归一化后的特征列表
+        """
+        import torch
         
-        text_descriptions = [label[1] for label in self.pattern_labels]
-        text_tokens = clip.tokenize(text_descriptions).to(self.device)
+        image_features = self._encode_images(torch.stack(images).to(self.device))
+        return list(image_features)
+    
+    def _encode_images(self, images):
+        """
+        编码一批CLIP预处理后的图像
+        :param images: 形状为 (N, 3, H, W) 的张量
+        :return: 归一化后的图像特征，形状为 (N, 嵌入维度)
+        """
+        import torch
         
         with torch.no_grad():
-            text_features = self.model.encode_text(text_tokens)
-            text_features = text_features / text_features.norm(dim=-1, keepdim=True)
-        
+            image_features = self.model.encode_image(images)
+            image_features = image_features / image_features.norm(dim=-1, keepdim=True)
+        return image_features
+    
+    def _matches_from_features(self, image_features, top_k=5):
+        """
+        根据图像特征匹配纹样
+        :param image_features: 归一化后的图像特征，形状为 (N, 嵌入维度)
+        :param top_k: 每张图像返回的匹配数量
+        :return: 长度为N的列表，每项为该图像的匹配结果列表
+        """
+        # 标签、文本嵌入和知识库取自同一版本，文本嵌入已缓存，这里只需一次矩阵乘法
+        kb, pattern_labels, text_features = self._pattern_index()
         similarity = (100.0 * image_features @ text_features.T).softmax(dim=-1)
-        values, indices = similarity[0].topk(top_k)
-        
+        values, indices = similarity.topk(min(top_k, len(pattern_labels)), dim=-1)
+        return [
+            self._build_matches(row_values, row_indices, kb, pattern_labels)
+            for row_values, row_indices in zip(values, indices)
+        ]
+    
+    def _build_matches(self, values, indices, kb, pattern_labels):
         matches = []
         for value, index in zip(values, indices):
-            pattern_id, description = self.pattern_labels[index]
-            pattern_info = next((p for p in self.patterns if p['id'] == pattern_id), None)
+            pattern_id, description = pattern_labels[index]
+            pattern_info = kb.pattern_by_id(pattern_id)
             if pattern_info:
                 matches.append({
                     'pattern_id': pattern_id,
@@ -353,9 +454,8 @@ class MultiDimensionalAnnotationTool:
                     if use not in folk_uses:
                         folk_uses.append(use)
             
-            region_id = pattern_info.get('region_id')
-            if region_id:
-                region = next((r for r in self.regions if r['id'] == region_id), None)
+            for region_id in pattern_region_ids(pattern_info):
+                region = self.kb.region_by_id(region_id)
                 if region:
                     regional_features.append(f"{region['name']}: {region['artistic_style']}")
         
@@ -394,7 +494,7 @@ class MultiDimensionalAnnotationTool:
             
             if 'related_patterns' in pattern_info and pattern_info['related_patterns']:
                 for related_id in pattern_info['related_patterns']:
-                    related_pattern = next((p for p in self.patterns if p['id'] == related_id), None)
+                    related_pattern = self.kb.pattern_by_id(related_id)
                     if related_pattern and related_pattern['name'] not in [r['pattern_name'] for r in related_patterns]:
                         related_patterns.append({
                             'pattern_name': related_pattern['name']
@@ -420,13 +520,44 @@ class MultiDimensionalAnnotationTool:
     def annotate(self, img_path):
         """
         对剪纸图像进行多维标注
+        :param img_path: 图像路径或DecodedImage（与图像识别工具共用同一解码结果）
         """
-        print(f"开始标注图像: {img_path}")
+        img_path = DecodedImage.ensure(img_path)
+        print(f"开始标注图像: {img_path.name}")
+        
+        # 相同图像字节、CLIP模型和知识库版本的标注结果直接从缓存返回
+        cache_key = self._result_cache_key(img_path)
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                cached['image_path'] = img_path.path
+                print(f"使用缓存的标注结果")
+                return cached
         
         visual_analysis, visual_features = self._analyze_visual_content(img_path)
         print(f"视觉分析结果: {visual_analysis['main_category']}, 人物:{visual_analysis.get('has_figure')}, 动物:{visual_analysis.get('has_animal')}")
         
         top_matches = self.match_patterns(img_path, top_k=10)
+        annotation_result = self._build_annotation(img_path, visual_analysis, visual_features, top_matches)
+        if cache_key is not None:
+            self.result_cache.set(cache_key, annotation_result)
+        return annotation_result
+    
+    def _result_cache_key(self, decoded):
+        """
+        计算标注结果的缓存键，没有原始字节时返回None（不缓存）
+        """
+        if not self.result_cache or decoded.data is None:
+            return None
+        model_version = CLIP_MODEL_NAME if self.has_torch else 'no-clip'
+        return result_cache_key(
+            'annotate', decoded.data, model_version, self.kb.version, features_version=FEATURES_VERSION
+        )
+    
+    def _build_annotation(self, img_path, visual_analysis, visual_features, top_matches):
+        """
+        根据视觉分析和纹样匹配结果组装四个维度的标注
+        """
         print(f"找到 {len(top_matches)} 个相似纹样")
         
         best_match = top_matches[0] if top_matches else None
@@ -439,7 +570,7 @@ class MultiDimensionalAnnotationTool:
         context_relation = self._annotate_context_relation(top_matches, visual_analysis)
         
         annotation_result = {
-            'image_path': img_path,
+            'image_path': img_path.path,
             'content_object': content_object,
             'form_visual': form_visual,
             'cultural_semantic': cultural_semantic,
@@ -464,6 +595,75 @@ class MultiDimensionalAnnotationTool:
         print(f"标注完成")
         return annotation_result
     
+    def _prepare_annotation_item(self, img_path):
+        """
+        批量标注时在工作线程中执行：解码图像、分析视觉特征并完成CLIP预处理
+        :return: (DecodedImage或None, 视觉分析, 视觉特征, CLIP张量或None, 错误信息或None)
+        """
+        try:
+            decoded = DecodedImage.ensure(img_path)
+            visual_analysis, visual_features = self._analyze_visual_content(decoded)
+            image = decoded.clip_tensor(self.preprocess) if self.has_torch else None
+            return decoded, visual_analysis, visual_features, image, None
+        except Exception as e:
+            return None, None, None, None, str(e)
+    
+    def annotate_batch(self, img_paths, batch_size=16, max_workers=None):
+        """
+        批量多维标注：并行解码和预处理图像，每批只执行一次CLIP图像编码
+        :param img_paths: 图像路径（或DecodedImage）列表
+        :param batch_size: 每批图像数量
+        :param max_workers: 预处理线程数，默认由ThreadPoolExecutor决定
+        :return: 与输入顺序一致的结果列表，每项与annotate返回的字典结构相同；
+                 处理失败的图像返回包含 image_path 和 error 的字典
+        """
+        img_paths = list(img_paths)
+        batches = [img_paths[i:i + batch_size] for i in range(0, len(img_paths), batch_size)]
+        results = []
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            def submit(batch):
+                return [executor.submit(self._prepare_annotation_item, path) for path in batch]
+            
+            # 预先提交下一批的预处理任务，使解码与CLIP编码重叠
+            pending = submit(batches[0]) if batches else []
+            for index, batch in enumerate(batches):
+                current = pending
+                pending = submit(batches[index + 1]) if index + 1 < len(batches) else []
+                items = [future.result() for future in current]
+                
+                valid = [i for i, item in enumerate(items) if item[3] is not None]
+                batch_matches = {}
+                if valid:
+                    try:
+                        import torch
+                        images = torch.stack([items[i][3] for i in valid]).to(self.device)
+                        image_features = self._encode_images(images)
+                        batch_matches = dict(zip(valid, self._matches_from_features(image_features, top_k=10)))
+                    except Exception as e:
+                        print(f"批量CLIP编码失败: {str(e)}")
+                        items = [item[:4] + (item[4] or f'CLIP编码失败: {str(e)}',) for item in items]
+                
+                for i, (decoded, visual_analysis, visual_features, image, error) in enumerate(items):
+                    if error is None:
+                        # 逐张隔离失败，单张图像出错不影响同批的其他图像
+                        try:
+                            print(f"开始标注图像: {decoded.name}")
+                            results.append(self._build_annotation(
+                                decoded, visual_analysis, visual_features, batch_matches.get(i, [])
+                            ))
+                            continue
+                        except Exception as e:
+                            print(f"标注图像 {decoded.name} 失败: {str(e)}")
+                            error = str(e)
+                    path = batch[i]
+                    results.append({
+                        'image_path': path.path if isinstance(path, DecodedImage) else path,
+                        'error': error
+                    })
+        
+        return results
+    
     def generate_combination_suggestions(self, annotation_result, theme=None):
         """
         根据标注结果生成组合设计建议
@@ -482,7 +682,7 @@ class MultiDimensionalAnnotationTool:
             for combo in combinations:
                 combo_pattern_names = []
                 for pattern_id in combo.get('patterns', []):
-                    pattern = next((p for p in self.patterns if p['id'] == pattern_id), None)
+                    pattern = self.kb.pattern_by_id(pattern_id)
                     if pattern:
                         combo_pattern_names.append(pattern['name'])
                 
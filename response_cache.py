@@ -0,0 +1,153 @@
+# 智能体回答缓存：按归一化问题、历史摘要、模型参数和知识库版本缓存LLM最终回答，SQLite持久化，TTL + LRU淘汰
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+from knowledge_store import CACHE_DIR_NAME
+from search_index import normalize_text
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_DIR_NAME, 'responses.sqlite3')
+DEFAULT_TTL = 24 * 3600
+DEFAULT_MAX_ENTRIES = 2000
+
+_WHITESPACE = re.compile(r'\s+')
+_TRAILING_PUNCTUATION = re.compile(r'[\s?!.。？！~～]+$')
+
+
+def normalize_query(query):
+    """
+    问题归一化：全角转半角、英文小写、合并空白、去掉末尾的问号和句号
+    “鱼纹寓意？”与“鱼纹寓意”视为同一个问题
+    """
+    text = _WHITESPACE.sub(' ', normalize_text(query)).strip()
+    return _TRAILING_PUNCTUATION.sub('', text)
+
+
+def history_digest(chat_history):
+    """
+    历史对话的摘要，历史为空时返回空字符串
+    :param chat_history: 历史对话字符串，或提供 digest() 的对话记忆对象
+    """
+    if not chat_history:
+        return ''
+    if hasattr(chat_history, 'digest'):
+        return chat_history.digest()
+    return hashlib.sha256(str(chat_history).encode('utf-8')).hexdigest()
+
+
+def response_cache_key(query, chat_history, model_name, temperature, kb_version):
+    """
+    计算缓存键
+    :return: 十六进制字符串
+    """
+    parts = [normalize_query(query), history_digest(chat_history), model_name, repr(float(temperature)), str(kb_version)]
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """
+    LLM回答缓存：
+    - 条目超过ttl秒后失效
+    - 条目数超过max_entries时淘汰最久未访问的条目
+    - hits/misses 记录命中情况
+    """
+    def __init__(self, sqlite_path=DEFAULT_SQLITE_PATH, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        :param sqlite_path: SQLite文件路径
+        :param ttl: 条目有效期（秒）
+        :param max_entries: 最大条目数
+        """
+        self.sqlite_path = sqlite_path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._counter_lock = threading.Lock()
+
+        os.makedirs(os.path.dirname(os.path.abspath(sqlite_path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+
+    def _connection(self):
+        """
+        每个线程使用独立的连接
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.sqlite_path, timeout=30)
+            self._local.connection = connection
+        return connection
+
+    def _count(self, hit):
+        with self._counter_lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get(self, key):
+        """
+        读取缓存的回答
+        :param key: 缓存键
+        :return: 回答文本，未命中或已过期时返回None
+        """
+        connection = self._connection()
+        now = time.time()
+        row = connection.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self._count(False)
+            return None
+
+        response, created_at = row
+        with connection:
+            if now - created_at > self.ttl:
+                connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                response = None
+            else:
+                connection.execute("UPDATE responses SET last_access = ? WHERE key = ?", (now, key))
+        self._count(response is not None)
+        return response
+
+    def set(self, key, response):
+        """
+        写入回答，并清理过期和超出数量上限的条目
+        """
+        connection = self._connection()
+        now = time.time()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            connection.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            connection.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM responses")
+
+    def stats(self):
+        """
+        缓存统计
+        :return: 包含 hits、misses、hit_rate、entries 的字典
+        """
+        entries = self._connection().execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': entries
+        }
@@ -0,0 +1,295 @@
+# 内容寻址的结果缓存：以图像字节的SHA-256加模型版本和知识库版本为键，持久化识别和标注结果
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from knowledge_store import CACHE_DIR_NAME
+
+# 结果结构变化时递增，旧缓存自动失效
+RESULT_FORMAT_VERSION = 2
+DEFAULT_CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), CACHE_DIR_NAME, 'results')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def result_cache_key(kind, image_data, model_version, kb_version=None, features_version=None):
+    """
+    计算缓存键
+    :param kind: 结果类型，如 'predict'、'annotate'
+    :param image_data: 图像文件的原始字节
+    :param model_version: 模型版本标识
+    :param kb_version: 知识库版本标识，结果与知识库无关时为None
+    :param features_version: 视觉特征算法版本（visual_features.FEATURES_VERSION），结果不含视觉特征时为None
+    :return: 十六进制字符串
+    """
+    image_sha256 = hashlib.sha256(image_data).hexdigest()
+    parts = [
+        str(RESULT_FORMAT_VERSION), kind, image_sha256, str(model_version), str(kb_version), str(features_version)
+    ]
+    return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+
+def file_version(path):
+    """
+    用文件路径、大小和修改时间作为模型文件的版本标识
+    :param path: 文件路径
+    :return: 版本字符串，文件不存在时返回None
+    """
+    try:
+        stat = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}"
+
+
+class DirectoryResultStore:
+    """
+    目录存储：每个结果一个文件，读取时更新修改时间，超出容量时按最久未访问淘汰
+    """
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param directory: 缓存目录
+        :param max_bytes: 缓存总大小上限（字节）
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._total_bytes = None
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def _entries(self):
+        """
+        列出全部缓存文件：(最后访问时间, 大小, 路径)
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.pkl'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            # 用修改时间记录最近访问，作为LRU淘汰依据
+            os.utime(path)
+        except OSError:
+            return None
+        return payload
+
+    def set(self, key, payload):
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(payload)
+        except OSError as e:
+            print(f"写入结果缓存失败: {str(e)}")
+            return
+
+        with self._lock:
+            # 覆盖同一个键时先减去被替换文件的大小，避免总大小只增不减、过早淘汰
+            try:
+                replaced_size = os.stat(path).st_size
+            except OSError:
+                replaced_size = 0
+            try:
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"写入结果缓存失败: {str(e)}")
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
+                return
+
+            if self._total_bytes is None:
+                self._total_bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._total_bytes += len(payload) - replaced_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        删除最久未访问的文件，直到总大小降到上限的90%以下
+        """
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                continue
+        self._total_bytes = total
+
+
+class SQLiteResultStore:
+    """
+    SQLite存储：单文件保存全部结果，按最后访问时间淘汰
+    """
+    def __init__(self, sqlite_path=None, max_bytes=DEFAULT_MAX_BYTES):
+        """
+        :param sqlite_path: SQLite文件路径，默认放在缓存目录下
+        :param max_bytes: 缓存总大小上限（字节）
+        """
+        self.sqlite_path = sqlite_path or os.path.join(DEFAULT_CACHE_DIR, 'results.sqlite3')
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.sqlite_path)), exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_results_last_access ON results(last_access)")
+
+    def _connection(self):
+        """
+        每个线程使用独立的连接
+        """
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.sqlite_path, timeout=30)
+            self._local.connection = connection
+        return connection
+
+    def get(self, key):
+        connection = self._connection()
+        row = connection.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        with connection:
+            connection.execute("UPDATE results SET last_access = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def set(self, key, payload):
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, sqlite3.Binary(payload), len(payload), time.time())
+            )
+            total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(connection, total)
+
+    def _evict(self, connection, total):
+        """
+        删除最久未访问的记录，直到总大小降到上限的90%以下
+        """
+        target = self.max_bytes * 0.9
+        stale = []
+        for key, size in connection.execute("SELECT key, size FROM results ORDER BY last_access"):
+            if total <= target:
+                break
+            stale.append((key,))
+            total -= size
+        connection.executemany("DELETE FROM results WHERE key = ?", stale)
+
+
+class ResultCache:
+    """
+    两级结果缓存：进程内LRU在前，持久化存储在后
+    结果以pickle字节保存，每次读取都返回新对象，调用方修改结果不会污染缓存
+    """
+    def __init__(self, store=None, memory_items=256):
+        """
+        :param store: 持久化存储（DirectoryResultStore或SQLiteResultStore），None表示只用内存
+        :param memory_items: 内存中保留的结果数量
+        """
+        self.store = store
+        self.memory_items = memory_items
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, key, payload):
+        with self._lock:
+            self._memory[key] = payload
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def get(self, key):
+        """
+        读取缓存结果
+        :param key: 缓存键
+        :return: 结果对象，未命中时返回None
+        """
+        with self._lock:
+            payload = self._memory.get(key)
+            if payload is not None:
+                self._memory.move_to_end(key)
+
+        if payload is None and self.store is not None:
+            try:
+                payload = self.store.get(key)
+            except Exception as e:
+                print(f"读取结果缓存失败: {str(e)}")
+                payload = None
+            if payload is not None:
+                self._remember(key, payload)
+
+        if payload is None:
+            self.misses += 1
+            return None
+        try:
+            result = pickle.loads(payload)
+        except Exception as e:
+            print(f"结果缓存已损坏，将重新计算: {str(e)}")
+            self.misses += 1
+            return None
+        self.hits += 1
+        return result
+
+    def set(self, key, result):
+        """
+        写入缓存结果
+        :param key: 缓存键
+        :param result: 可pickle的结果对象
+        """
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        self._remember(key, payload)
+        if self.store is not None:
+            try:
+                self.store.set(key, payload)
+            except Exception as e:
+                print(f"写入结果缓存失败: {str(e)}")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_result_cache():
+    """
+    获取进程内共享的默认结果缓存（目录存储）
+    :return: ResultCache实例
+    """
+    global _default_cache
+    if _default_cache is None:
+        with _default_cache_lock:
+            if _default_cache is None:
+                _default_cache = ResultCache(DirectoryResultStore())
+    return _default_cache
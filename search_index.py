@@ -0,0 +1,157 @@
+# 纹样全文检索：基于中文字符n-gram的倒排索引，使用BM25排序
+import math
+import re
+import unicodedata
+
+# 参与检索的字段及其权重，名称和别名命中比正文描述更重要
+SEARCH_FIELDS = {
+    'name': 3.0,
+    'aliases': 2.5,
+    'symbolism': 1.5,
+    'appearance_description': 1.0,
+    'cultural_background': 1.0,
+    'usage_scenarios': 1.0,
+}
+
+# 标点和空白作为分段边界，n-gram不跨越分段
+_SEPARATORS = re.compile(r"[\s,.;:!?'\"()\[\]{}<>/\\|~`@#$%^&*+=\-_，。、；：！？“”‘’（）《》【】·…]+")
+
+
+def normalize_text(text):
+    """
+    文本归一化：全角转半角、英文转小写
+    """
+    return unicodedata.normalize('NFKC', str(text)).lower()
+
+
+def split_segments(text):
+    """
+    按标点和空白将文本切分为若干片段
+    """
+    return [segment for segment in _SEPARATORS.split(normalize_text(text)) if segment]
+
+
+def segment_ngrams(segment, sizes):
+    """
+    生成单个片段的字符n-gram
+    :param segment: 文本片段
+    :param sizes: n-gram长度元组
+    :return: n-gram列表
+    """
+    grams = []
+    for n in sizes:
+        grams.extend(segment[i:i + n] for i in range(len(segment) - n + 1))
+    return grams
+
+
+def field_values(document, field):
+    """
+    取出字段的文本值，列表字段的每一项单独切分
+    """
+    value = document.get(field)
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+
+class PatternSearchIndex:
+    """
+    纹样倒排索引：索引单字、二元和三元字符组，查询代价只与命中的倒排表长度相关
+    """
+    def __init__(self, documents, fields=None, k1=1.2, b=0.75):
+        """
+        构建倒排索引
+        :param documents: 纹样信息字典序列
+        :param fields: 字段权重字典，默认使用 SEARCH_FIELDS
+        :param k1: BM25词频饱和参数
+        :param b: BM25文档长度归一化参数
+        """
+        self.documents = tuple(documents)
+        self.fields = fields or SEARCH_FIELDS
+        self.k1 = k1
+        self.b = b
+        self.postings = {}
+        self.doc_lengths = []
+        self._build()
+
+    def _build(self):
+        for doc_index, document in enumerate(self.documents):
+            weighted_tf = {}
+            length = 0.0
+            for field, weight in self.fields.items():
+                for value in field_values(document, field):
+                    for segment in split_segments(value):
+                        for gram in segment_ngrams(segment, (1, 2, 3)):
+                            weighted_tf[gram] = weighted_tf.get(gram, 0.0) + weight
+                            length += weight
+            for gram, tf in weighted_tf.items():
+                self.postings.setdefault(gram, {})[doc_index] = tf
+            self.doc_lengths.append(length)
+
+        total_length = sum(self.doc_lengths)
+        self.avg_doc_length = total_length / len(self.doc_lengths) if self.doc_lengths else 0.0
+
+    def _query_terms(self, query):
+        """
+        拆分查询：返回必须全部命中的过滤词，以及参与打分的词
+        单字片段按单字匹配，多字片段要求所有二元组命中，并用二元和三元组打分
+        """
+        required = []
+        scoring = []
+        for segment in split_segments(query):
+            if len(segment) == 1:
+                required.append(segment)
+                scoring.append(segment)
+            else:
+                required.extend(segment_ngrams(segment, (2,)))
+                scoring.extend(segment_ngrams(segment, (2, 3)))
+        return list(dict.fromkeys(required)), list(dict.fromkeys(scoring))
+
+    def _idf(self, term):
+        doc_freq = len(self.postings.get(term, ()))
+        total = len(self.documents)
+        return math.log(1 + (total - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def search(self, query, limit=None):
+        """
+        检索纹样
+        :param query: 查询文本
+        :param limit: 返回结果数量上限，None表示全部
+        :return: (纹样信息, 得分) 列表，按得分降序
+        """
+        required, scoring = self._query_terms(query)
+        if not required:
+            results = [(document, 0.0) for document in self.documents]
+            return results[:limit] if limit is not None else results
+
+        posting_lists = [self.postings.get(term) for term in required]
+        if not all(posting_lists):
+            return []
+
+        # 从最短的倒排表开始求交集
+        posting_lists.sort(key=len)
+        candidates = set(posting_lists[0])
+        for postings in posting_lists[1:]:
+            candidates.intersection_update(postings)
+            if not candidates:
+                return []
+
+        scores = dict.fromkeys(candidates, 0.0)
+        for term in scoring:
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf(term)
+            for doc_index in candidates:
+                tf = postings.get(doc_index)
+                if not tf:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_index] / self.avg_doc_length)
+                scores[doc_index] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        if limit is not None:
+            ranked = ranked[:limit]
+        return [(self.documents[doc_index], score) for doc_index, score in ranked]
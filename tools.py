@@ -1,30 +1,51 @@
 from langchain_core.tools import Tool
 from knowledge_tool import KnowledgeTool
 from design_tool import DesignTool
+from inference_scheduler import micro_batching_enabled
+import importlib.util
 import json
+import os
+import threading
 
 # 先初始化不需要模型的工具
 knowledge_tool = KnowledgeTool()
-design_tool = DesignTool()
+design_tool = DesignTool(knowledge_tool)
 
-# 尝试初始化多维标注工具（torch依赖）
-try:
-    from multidimensional_annotation_tool import MultiDimensionalAnnotationTool
-    multidimensional_annotation_tool = MultiDimensionalAnnotationTool()
-    HAS_MULTIDIMENSIONAL_TOOL = True
-except ImportError:
-    multidimensional_annotation_tool = None
-    HAS_MULTIDIMENSIONAL_TOOL = False
+# 多维标注工具在第一次调用时才创建，纯文本会话不会导入torch或加载CLIP模型
+multidimensional_annotation_tool = None
+# 只检查标注模块导入时必需的依赖是否已安装，不实际导入；torch和clip是可选的（没有时只做视觉特征分析）
+HAS_MULTIDIMENSIONAL_TOOL = all(
+    importlib.util.find_spec(module) is not None for module in ('PIL', 'numpy', 'tensorflow')
+)
+_multidimensional_tool_lock = threading.Lock()
+
+def get_multidimensional_annotation_tool():
+    """
+    获取多维标注工具实例，首次调用时创建
+    :return: MultiDimensionalAnnotationTool实例
+    """
+    global multidimensional_annotation_tool
+    if multidimensional_annotation_tool is None:
+        with _multidimensional_tool_lock:
+            if multidimensional_annotation_tool is None:
+                from multidimensional_annotation_tool import MultiDimensionalAnnotationTool
+                multidimensional_annotation_tool = MultiDimensionalAnnotationTool()
+                # 设置 PAPERCUT_MICRO_BATCHING=1 时并发的CLIP编码请求合并成批
+                if micro_batching_enabled():
+                    multidimensional_annotation_tool.enable_batching()
+    return multidimensional_annotation_tool
 
 # 延迟导入和初始化图像识别工具，避免在模块导入时加载模型
 ImageRecognitionTool = None
 image_tool = None
+ensure_image_model_loaded = None
 
 # 只有在需要时才初始化图像识别工具
 try:
-    from image_tool import ImageRecognitionTool
-    # 不立即创建实例，而是在需要时才创建
-    # image_tool = ImageRecognitionTool(model_path=None)
+    from image_tool import ImageRecognitionTool, ensure_image_model_loaded, get_shared_image_tool, prewarm_image_tool
+    # 模型由共享加载器负责，只加载一次；设置 PAPERCUT_PREWARM_MODEL=1 时在后台提前加载
+    if os.environ.get("PAPERCUT_PREWARM_MODEL") == "1":
+        prewarm_image_tool()
 except ImportError as e:
     print(f"Warning: Failed to import ImageRecognitionTool: {e}")
 
@@ -45,11 +66,9 @@ def create_tools():
         """
         global image_tool
         try:
-            # 如果image_tool未初始化，尝试初始化
-            if image_tool is None and ImageRecognitionTool:
-                image_tool = ImageRecognitionTool(model_path=None)
-                # 尝试加载模型
-                image_tool.load_model()
+            # 第一次调用时加载模型，并发调用等待同一次加载完成
+            if image_tool is None and ensure_image_model_loaded and ensure_image_model_loaded():
+                image_tool = get_shared_image_tool()
             
             if image_tool and image_tool.model is not None:
                 result = image_tool.predict(image_path)
@@ -244,7 +263,7 @@ def create_tools():
                 JSON格式的多维标注结果，包括内容/对象、形式/视觉、文化/语义、关联/情境四个维度
             """
             try:
-                result = multidimensional_annotation_tool.annotate(image_path)
+                result = get_multidimensional_annotation_tool().annotate(image_path)
                 return json.dumps(result, ensure_ascii=False, indent=2)
             except Exception as e:
                 return f"标注失败: {str(e)}"
@@ -272,7 +291,7 @@ def create_tools():
             try:
                 # 解析JSON字符串为字典
                 annotation_dict = json.loads(annotation_result)
-                result = multidimensional_annotation_tool.generate_combination_suggestions(annotation_dict, theme)
+                result = get_multidimensional_annotation_tool().generate_combination_suggestions(annotation_dict, theme)
                 return json.dumps(result, ensure_ascii=False, indent=2)
             except json.JSONDecodeError as e:
                 return f"标注结果格式错误: {str(e)}"
@@ -0,0 +1,159 @@
+# 剪纸视觉特征提取：在有界分辨率的缩略图上用NumPy一次性计算全部特征，所有函数都支持批量输入
+import numpy as np
+
+# 特征分析使用的最长边上限，手机拍摄的4000×3000原图会先缩小到这个尺寸
+MAX_FEATURE_SIZE = 512
+
+# 特征算法、分析尺寸或分类阈值变化时递增，缓存的识别和标注结果随之失效
+# 2: 有界缩略图 + 有符号差分（修正uint8回绕），line_style 等标签与1不同
+FEATURES_VERSION = 2
+
+# ITU-R 601-2 亮度系数，与PIL的convert('L')一致
+_GRAY_WEIGHTS = np.array([0.299, 0.587, 0.114], dtype=np.float32)
+
+
+def _gaussian_kernel(sigma):
+    radius = int(np.ceil(3 * sigma))
+    x = np.arange(-radius, radius + 1, dtype=np.float32)
+    kernel = np.exp(-x ** 2 / (2 * sigma ** 2))
+    return kernel / kernel.sum()
+
+
+def _convolve_axis(images, kernel, axis):
+    """
+    沿指定轴做一维卷积（边缘复制填充），images的前导维度为批次
+    """
+    radius = len(kernel) // 2
+    pad = [(0, 0)] * images.ndim
+    pad[axis] = (radius, radius)
+    padded = np.pad(images, pad, mode='edge')
+    length = images.shape[axis]
+    result = np.zeros_like(images)
+    for offset, weight in enumerate(kernel):
+        result += weight * np.take(padded, np.arange(offset, offset + length), axis=axis)
+    return result
+
+
+def to_gray(rgb):
+    """
+    RGB转灰度
+    :param rgb: uint8数组，形状为 (..., 高, 宽, 3)
+    :return: float32灰度数组，形状为 (..., 高, 宽)
+    """
+    return rgb.astype(np.float32) @ _GRAY_WEIGHTS
+
+
+def edge_density(gray):
+    """
+    相邻像素差的平均幅度，归一化到0-1
+    差分在有符号类型上计算，避免uint8相减时负数回绕成大正数
+    :param gray: 灰度数组，形状为 (N, 高, 宽)
+    :return: 形状为 (N,) 的数组
+    """
+    gray = gray.astype(np.float32)
+    horizontal = np.abs(np.diff(gray, axis=-1)).mean(axis=(-2, -1))
+    vertical = np.abs(np.diff(gray, axis=-2)).mean(axis=(-2, -1))
+    return (horizontal + vertical) / 2 / 255.0
+
+
+def white_ratio(gray, threshold=200):
+    """
+    亮度高于阈值的像素比例（纸张镂空部分）
+    :return: 形状为 (N,) 的数组
+    """
+    return (gray > threshold).mean(axis=(-2, -1))
+
+
+def color_spread(rgb):
+    """
+    三个颜色通道均值之间的标准差，越小越接近单色
+    :param rgb: uint8数组，形状为 (N, 高, 宽, 3)
+    :return: 形状为 (N,) 的数组
+    """
+    channel_means = rgb.astype(np.float32).mean(axis=(-3, -2))
+    return channel_means.std(axis=-1)
+
+
+def texture_variance(gray, sigma=2.0):
+    """
+    纸张纹理：高斯模糊后做8邻域拉普拉斯边缘检测，取响应的方差
+    等价于PIL的 GaussianBlur(radius=2) + FIND_EDGES
+    :return: 形状为 (N,) 的数组
+    """
+    kernel = _gaussian_kernel(sigma)
+    blurred = _convolve_axis(_convolve_axis(gray.astype(np.float32), kernel, -1), kernel, -2)
+    padded = np.pad(blurred, [(0, 0)] * (blurred.ndim - 2) + [(1, 1), (1, 1)], mode='edge')
+    height, width = blurred.shape[-2:]
+    neighbours = np.zeros_like(blurred)
+    for dy in range(3):
+        for dx in range(3):
+            if dy == 1 and dx == 1:
+                continue
+            neighbours += padded[..., dy:dy + height, dx:dx + width]
+    # FIND_EDGES的输出是uint8，负响应截断为0
+    edges = np.clip(np.round(8 * blurred - neighbours), 0, 255)
+    return edges.var(axis=(-2, -1))
+
+
+def feature_statistics(rgb):
+    """
+    一次计算全部数值特征
+    :param rgb: uint8数组，形状为 (N, 高, 宽, 3)
+    :return: 字典，每个值是形状为 (N,) 的数组
+    """
+    gray = to_gray(rgb)
+    return {
+        'edge_density': edge_density(gray),
+        'white_ratio': white_ratio(gray),
+        'color_spread': color_spread(rgb),
+        'texture_variance': texture_variance(gray)
+    }
+
+
+def classify_features(edge, white, spread, texture):
+    """
+    将数值特征转换为标注用的文字描述
+    :return: 包含 line_style、cutting_technique、color、paper_texture 的字典
+    """
+    if white > 0.6:
+        cutting_technique = '阳刻'  # 保留主体，镂空背景
+    elif white < 0.4:
+        cutting_technique = '阴刻'  # 镂空主体，保留背景
+    else:
+        cutting_technique = '阴阳刻结合'
+
+    return {
+        'line_style': '粗犷' if edge < 0.1 else '细腻',
+        'cutting_technique': cutting_technique,
+        'color': '单色' if spread < 30 else '套色',
+        'paper_texture': '平滑' if texture < 1000 else '粗糙'
+    }
+
+
+def classify_batch(statistics):
+    """
+    批量转换数值特征
+    :param statistics: feature_statistics的返回值
+    :return: 特征字典列表
+    """
+    return [
+        classify_features(float(edge), float(white), float(spread), float(texture))
+        for edge, white, spread, texture in zip(
+            statistics['edge_density'], statistics['white_ratio'],
+            statistics['color_spread'], statistics['texture_variance']
+        )
+    ]
+
+
+def extract_visual_features(decoded, max_size=MAX_FEATURE_SIZE):
+    """
+    分析单张图像的视觉特征，结果缓存在DecodedImage上，同一图像重复分析不再计算
+    :param decoded: DecodedImage
+    :param max_size: 分析时的最长边上限
+    :return: 视觉特征字典
+    """
+    def build():
+        rgb = np.asarray(decoded.bounded_rgb(max_size))
+        return classify_batch(feature_statistics(rgb[np.newaxis]))[0]
+
+    return dict(decoded.cached(('visual_features', max_size), build))